@@ -1,12 +1,82 @@
 # backend/routers/admin.py
-from fastapi import APIRouter
-from backend.services.product_loader import reload_products
-from backend.services.search_service import reset_index
+from typing import Any, Dict, List
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from backend.services.search_service import apply_changes, current_index, reload_index
+from backend.routers.chat import LLM_FLIGHT, LLM_GATE, SEARCH_FLIGHT
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+class ProductsIn(BaseModel):
+    # parches por producto (cada uno con "code"); se fusionan con el registro existente
+    products: List[Dict[str, Any]]
+
+class CodesIn(BaseModel):
+    codes: List[str]
+
+# tipos de los campos que se normalizan al cargar (los demás se guardan tal cual)
+_FIELD_TYPES = {"code": str, "name": str, "price": str, "category": str, "url": str, "img_url": str,
+                "categories": list, "tags": list, "specs": dict}
+
+def _check(upserts: Dict[str, dict]):
+    productos = current_index().productos
+    for code, p in upserts.items():
+        for field, typ in _FIELD_TYPES.items():
+            v = p.get(field)
+            if v is not None and not isinstance(v, typ):
+                raise HTTPException(status_code=400, detail=f"{code}: {field} must be a {typ.__name__}")
+            if typ is list and v and not all(isinstance(x, str) for x in v):
+                raise HTTPException(status_code=400, detail=f"{code}: {field} must be a list of strings")
+        # un parche sobre un código que no existe crea el producto: tiene que traer el nombre
+        if code not in productos and not str(p.get("name") or "").strip():
+            raise HTTPException(status_code=400, detail=f"new product {code} needs a name")
+
+def _apply(upserts: Dict[str, dict], deletes: List[str]) -> Dict:
+    try:
+        return _changed(apply_changes(upserts, deletes))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _changed(snap) -> Dict:
+    return {"ok": True, "count": len(snap.productos), "version": snap.version}
+
 @router.post("/reload")
 def reload_catalog():
-    prods, path = reload_products()
-    reset_index()
-    return {"ok": True, "count": len(prods), "path": str(path)}
+    # se construye aparte y se publica de una vez; las búsquedas en curso terminan con el anterior
+    snap = reload_index()
+    return {"ok": True, "count": len(snap.productos), "path": str(snap.path), "version": snap.version}
+
+@router.post("/products")
+def upsert_products(in_: ProductsIn):
+    upserts: Dict[str, dict] = {}
+    for p in in_.products:
+        code = str(p.get("code") or "").strip()
+        if not code:
+            raise HTTPException(status_code=400, detail="each product needs a code")
+        upserts[code] = {**upserts.get(code, {}), **p, "code": code}
+    _check(upserts)
+    return _apply(upserts, [])
+
+@router.put("/products/{code}")
+def upsert_product(code: str, patch: Dict[str, Any]):
+    upserts = {code: {**patch, "code": code}}
+    _check(upserts)
+    return _apply(upserts, [])
+
+@router.post("/products/delete")
+def delete_products(in_: CodesIn):
+    return _changed(apply_changes({}, in_.codes))
+
+@router.delete("/products/{code}")
+def delete_product(code: str):
+    return _changed(apply_changes({}, [code]))
+
+@router.get("/coalescing")
+def coalescing_stats():
+    """Llamadas y cuántas se resolvieron esperando una idéntica en curso, por consulta."""
+    return {"search": SEARCH_FLIGHT.stats(), "llm": LLM_FLIGHT.stats()}
+
+@router.get("/admission")
+def admission_stats():
+    """Llamadas al LLM en curso, en cola, admitidas y descartadas por motivo."""
+    return LLM_GATE.stats()
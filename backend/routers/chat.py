@@ -1,37 +1,87 @@
 # backend/routers/chat.py
 from __future__ import annotations
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional, List, Dict
-import hashlib
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import AsyncIterator, Optional, List, Dict, Tuple
+import asyncio, base64, hashlib, json, logging, re, time
 
-from backend.services.search_service import search_candidates
-from backend.services.context_builder import build_context
-from backend.services.openai_client import ask_chatgpt
+from backend.routers import faq
+from backend.services.admission import LLM_DEADLINE_S, LLM_MAX_INFLIGHT, LLM_MAX_QUEUE, AdmissionGate, Shed
+from backend.services.search_service import IndexSnapshot, current_index, search_page, similar_products
+from backend.services.context_builder import IdExpander, build_prompt, expand_ids
+from backend.services.openai_client import FALLBACK_REPLY, ask_chatgpt_async, stream_chatgpt
+from backend.services.reply_cache import get_cache, reply_key
+from backend.services.single_flight import SingleFlight
+from backend.services.suggest_index import record_query
+from backend.services.text_analysis import norm_txt
+
+logger = logging.getLogger("uvicorn.error")
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+# Requests idénticos concurrentes comparten trabajo. La búsqueda se comparte solo con la
+# misma semilla (_stable_seed: sesión + consulta, el orden de cada sesión no cambia); la
+# llamada al LLM, entre sesiones, cuando el prompt coincide (clave de reply_cache: consulta,
+# página y códigos de los candidatos).
+SEARCH_FLIGHT = SingleFlight("search")
+LLM_FLIGHT = SingleFlight("llm")
+# Tope de llamadas al LLM en curso y en cola; lo que no entra en el plazo sale sin texto del LLM
+LLM_GATE = AdmissionGate("llm", LLM_MAX_INFLIGHT, LLM_MAX_QUEUE)
+
 class ChatIn(BaseModel):
     session_id: str
-    message: str
+    message: str = Field(max_length=2000)
     page: Optional[int] = 0
     last_query: Optional[str] = None
+    cursor: Optional[str] = None  # devuelto por la respuesta anterior; reemplaza page + last_query
 
 def _stable_seed(session_id: str, q: str) -> int:
     h = hashlib.md5((session_id + "|" + (q or "")).encode("utf-8")).hexdigest()
     return int(h[:8], 16)
 
-def _as_response(text: str, products: List[Dict], page: int, last_query: str) -> Dict:
-    return {"content": text, "products": products, "page": page, "last_query": last_query}
+def _cursor(query: str, page: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([query, page], ensure_ascii=False).encode("utf-8")).decode("ascii")
 
-@router.post("/")
-def chat(in_: ChatIn):
+def _from_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        query, page = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(query), max(0, int(page))
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+def _as_response(text: str, products: List[Dict], page: int, last_query: str, catalog_version: int,
+                 cursor: Optional[str]) -> Dict:
+    return {"content": text, "products": products, "page": page, "last_query": last_query,
+            "catalog_version": catalog_version, "cursor": cursor}
+
+def _search(query: str, state: dict, limit: int, offset: int):
+    index = current_index()  # la misma versión del catálogo para la búsqueda y la respuesta
+    # el ranking queda en caché (ranked_cache): las páginas siguientes solo recortan la lista
+    cand, more = search_page(query, state, limit=limit, offset=offset, exclude_codes=[], index=index)
+    return index, cand, more
+
+async def _shared_search(query: str, state: dict, page: int, limit: int):
+    # la búsqueda es CPU (ms) y va al threadpool; la llamada al LLM se espera sin ocupar un hilo
+    index, cand, more = await SEARCH_FLIGHT.do(
+        (query, page, state["result_seed"]),
+        lambda: run_in_threadpool(_search, query, state, limit, page * limit),
+        label=f"{query}|p{page}",
+    )
+    if page == 0 and cand:
+        record_query(query)  # popularidad para /search/suggest
+    return index, cand, more
+
+def _state(in_: ChatIn) -> Tuple[dict, int, str]:
     msg = (in_.message or "").strip()
-    if not msg:
+    if in_.cursor:
+        effective_query, page = _from_cursor(in_.cursor)
+    elif not msg:
         raise HTTPException(status_code=400, detail="message is required")
-
-    page = max(0, int(in_.page or 0))
-    effective_query = in_.last_query if page > 0 and in_.last_query else msg
+    else:
+        page = max(0, int(in_.page or 0))
+        effective_query = in_.last_query if page > 0 and in_.last_query else msg
 
     # Estado efímero solo para ranking (STATeless)
     state = {
@@ -40,12 +90,149 @@ def chat(in_: ChatIn):
         "preferencias": {},
         "last_user_msg": effective_query,
     }
+    return state, page, effective_query
+
+def _cache_key(query: str, page: int, cand: List[Dict]) -> str:
+    # build_prompt solo depende de la consulta, la página y los candidatos
+    return reply_key(query, page, [c.get("code") for c in cand])
+
+def _remember(key: str, version: int, reply: str):
+    cache = get_cache()
+    if cache is not None and reply and reply != FALLBACK_REPLY:  # no se cachean fallas
+        cache.put(key, version, reply)
+
+def _remaining(t0: float) -> float:
+    return LLM_DEADLINE_S - (time.monotonic() - t0)
+
+def _degraded_reply(cand: List[Dict]) -> str:
+    # el LLM no llegó a tiempo (o no hubo turno): texto fijo sobre los productos ya buscados
+    if not cand:
+        return "No encontré productos para eso. ¿Me cuentas el espacio, la potencia o el tipo de luz que buscas? 💡"
+    return f"Encontré {len(cand)} opciones para ti 💡 Si me cuentas el espacio o la potencia que necesitas, te ayudo a elegir."
+
+_SIMILAR_ASK = re.compile(r"\b(?:parecid[oa]s?|similar(?:es)?|alternativas?|reemplazos?)\b")
+
+def _similar(message: str) -> Optional[Tuple[IndexSnapshot, str, List[Dict]]]:
+    # "algo parecido a LEDLC3B": vecinos precalculados del producto (ver similar_index)
+    if not _SIMILAR_ASK.search(norm_txt(message)):
+        return None
+    index = current_index()
+    for word in reversed(message.split()):
+        code = word.strip(".,;:!?¿¡()\"'")
+        cand = similar_products(code, 5, index) if len(code) >= 3 else None
+        if cand:
+            return index, f"Estos productos son parecidos a {code.upper()} 💡 ¿Te ayudo a comparar alguno?", cand
+    return None
+
+async def _fixed_reply(in_: ChatIn, page: int) -> Optional[Tuple[IndexSnapshot, str, List[Dict]]]:
+    """Respuestas sin búsqueda ni LLM: FAQ (garantía, envíos, contacto...) y "parecidos a <código>"."""
+    if page or in_.cursor:
+        return None
+    index = await run_in_threadpool(current_index)
+    answer = faq.try_answer(in_.message, index)
+    if answer is not None:
+        return index, answer, []
+    return await run_in_threadpool(_similar, in_.message)
+
+@router.post("/")
+async def chat(in_: ChatIn):
+    t0 = time.monotonic()
+    state, page, effective_query = _state(in_)
+    fixed = await _fixed_reply(in_, page)
+    if fixed is not None:
+        index, text, products = fixed
+        return _as_response(text, products, page, effective_query, index.version, None)
+
+    index, cand, more = await _shared_search(effective_query, state, page, limit=5)
+    cursor = _cursor(effective_query, page + 1) if more else None
+
+    key, cache = _cache_key(effective_query, page, cand), get_cache()
+    reply = cache.get(key, index.version) if cache is not None else None
+    if reply is None:
+        async def ask() -> str:
+            async with LLM_GATE.slot(_remaining(t0)):
+                prompt = build_prompt(state, cand)
+                out = expand_ids(await ask_chatgpt_async(prompt.system, prompt.user), prompt.ids)
+            _remember(key, index.version, out)
+            return out
+        try:
+            # la llamada compartida sigue aunque este request deje de esperarla: llena la caché
+            reply = await asyncio.wait_for(
+                LLM_FLIGHT.do((key, index.version), ask, label=f"{effective_query}|p{page}"), _remaining(t0))
+        except asyncio.TimeoutError:
+            LLM_GATE.reject("deadline")
+            reply = _degraded_reply(cand)
+        except Shed:
+            reply = _degraded_reply(cand)
+
+    return _as_response(reply, cand, page, effective_query, index.version, cursor)
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/stream")
+async def chat_stream(in_: ChatIn):
+    """Server-Sent Events: `products` de inmediato, luego `delta` por fragmento del LLM y `done` al final.
+
+    Si el primer fragmento no llega dentro del plazo, se envía el texto fijo en su lugar."""
+    t0 = time.monotonic()
+    state, page, effective_query = _state(in_)
+    fixed = await _fixed_reply(in_, page)
+    if fixed is not None:
+        (index, cached, cand), cursor = fixed, None
+    else:
+        index, cand, more = await _shared_search(effective_query, state, page, limit=5)
+        cursor = _cursor(effective_query, page + 1) if more else None
+        key, cache = _cache_key(effective_query, page, cand), get_cache()
+        cached = cache.get(key, index.version) if cache is not None else None
 
-    limit = 5
-    offset = page * limit
-    cand = search_candidates(effective_query, state, limit=limit, offset=offset, exclude_codes=[])
+    async def events() -> AsyncIterator[str]:
+        yield _sse("products", {"products": cand, "page": page, "last_query": effective_query,
+                                "catalog_version": index.version, "cursor": cursor})
+        if cached is not None:
+            yield _sse("delta", {"text": cached})
+            yield _sse("done", {"content": cached})
+            return
+        async def generate() -> AsyncIterator[str]:
+            async with LLM_GATE.slot(_remaining(t0)):
+                prompt = build_prompt(state, cand)
+                ids, parts = IdExpander(prompt.ids), []
+                async for delta in stream_chatgpt(prompt.system, prompt.user):
+                    text = ids.feed(delta)
+                    if text:
+                        parts.append(text)
+                        yield text
+                tail = ids.flush()
+                if tail:
+                    parts.append(tail)
+                    yield tail
+            _remember(key, index.version, "".join(parts))
 
-    system_prompt = build_context(state, cand)
-    reply = ask_chatgpt(system_prompt)
+        parts: List[str] = []
+        stream = LLM_FLIGHT.stream((key, index.version), generate, label=f"{effective_query}|p{page}")
+        try:
+            try:
+                first = await asyncio.wait_for(anext(stream, None), _remaining(t0))
+            except asyncio.TimeoutError:
+                raise LLM_GATE.reject("deadline") from None
+            if first is not None:
+                parts.append(first)
+                yield _sse("delta", {"text": first})
+            async for delta in stream:
+                parts.append(delta)
+                yield _sse("delta", {"text": delta})
+        except Shed:
+            # sin turno o sin primer fragmento a tiempo (el slot se toma antes del primero)
+            reply = _degraded_reply(cand)
+            yield _sse("delta", {"text": reply})
+            yield _sse("done", {"content": reply})
+            return
+        except Exception:
+            # respuesta cortada: se entrega lo que llegó, pero no se cachea
+            logger.exception("Error en /chat/stream")
+            yield _sse("error", {"error": "internal_error"})
+        yield _sse("done", {"content": "".join(parts) or FALLBACK_REPLY})
 
-    return _as_response(reply, cand, page, effective_query)
+    # X-Accel-Buffering: que un proxy (nginx) no acumule el stream
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,6 +1,11 @@
+# backend/routers/faq.py
+from typing import Dict
 from fastapi import APIRouter
 import re
 
+from backend.services.search_service import IndexSnapshot, catalog_terms
+from backend.services.text_analysis import split_norm, strip_accents
+
 router = APIRouter(prefix="/faq", tags=["faq"])
 
 @router.get("/")
@@ -51,22 +56,66 @@ FAQS = {
     ),
 }
 
-def try_answer(user_msg: str) -> str | None:
-    """Devuelve una respuesta de FAQ si el mensaje del usuario coincide con una palabra clave."""
-    msg = user_msg.lower()
+# En orden de prioridad: si coinciden palabras de varios grupos gana el primero. Sin palabras
+# sueltas genéricas ("tiempo", "empresa", "llega"...): aparecen también en consultas de productos
+_RULES = {
+    "garantia": ["garantia", "garantía"],
+    "casos_sin_garantia": ["no cubre", "cuando no", "casos sin garantia"],
+    "plazo_reclamo": ["plazo", "cuanto tiempo", "cuántos días", "cuantos dias", "tiempo de respuesta"],
+    "politica_envios": ["envio", "envíos", "enviar", "domicilio", "cuando llega", "cuanto tarda", "cuanto demora"],
+    "politica_devoluciones": ["devolucion", "devolución", "reembolso", "reembolsar", "quiero reembolsar"],
+    "cambio_producto": ["cambiar", "devolver", "devolucion", "devolución", "cambiar producto", "cambio de producto"],
+    "quienes_somos": ["quienes son", "quiénes", "que es ecolite", "sobre ecolite", "su empresa"],
+    "contacto": ["contacto", "telefono", "correo electronico", "su correo", "linea de atencion", "servicio al cliente"],
+}
 
-    rules = {
-        "garantia": ["garantia", "garantía"],
-        "casos_sin_garantia": ["no cubre", "cuando no", "casos sin garantia"],
-        "plazo_reclamo": ["plazo", "tiempo", "dias", "días"],
-        "politica_envios": ["envio", "envíos", "enviar", "domicilio", "llega"],"politica_devoluciones": ["devolucion", "devolución", "reembolso", "reembolsar", "quiero reembolsar"],
-        "cambio_producto": ["cambiar", "cambio", "devolver", "devolucion", "devolución", "cambiar producto"],
-        "quienes_somos": ["quienes son", "empresa", "ecolite", "quiénes"],
-        "contacto": ["contacto", "telefono", "correo", "atencion"],
-    }
+def _fold(s: str) -> str:
+    return " ".join(strip_accents((s or "").lower()).split())
+
+def _compile():
+    """Una sola alternación sobre texto sin tildes. Cada palabra clave resuelve a la prioridad
+    más alta entre su grupo y los de palabras contenidas en ella ("casos sin garantia" ⊃
+    "garantia"), porque un match largo tapa a los cortos que lleva dentro."""
+    prio: Dict[str, int] = {}
+    for i, kws in enumerate(_RULES.values()):
+        for k in kws:
+            prio.setdefault(_fold(k), i)
+    for k in prio:
+        prio[k] = min(p for sub, p in prio.items() if re.search(rf"\b{re.escape(sub)}\b", k))
+    alts = sorted(prio, key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(map(re.escape, alts)) + r")\b"), prio, list(_RULES)
+
+_MATCHER, _PRIO, _KEYS = _compile()
+# palabras de las reglas: no cuentan como términos de catálogo ("telefono" también es un tag)
+_RULE_TOKENS = frozenset(t for kws in _RULES.values() for k in kws for t in split_norm(_fold(k)))
+_STATS = {"checks": 0, "hits": 0, "catalog": 0, "by_key": {k: 0 for k in _KEYS}}
+
+def match(user_msg: str) -> str | None:
+    """Clave de FAQ para el mensaje (una pasada de regex precompilada) o None."""
+    best = None
+    for m in _MATCHER.finditer(_fold(user_msg)):
+        p = _PRIO[m.group(0)]
+        if best is None or p < best:
+            best = p
+            if p == 0:
+                break
+    return None if best is None else _KEYS[best]
 
-    for key, keywords in rules.items():
-        if any(re.search(rf"\b{k}\b", msg) for k in keywords):
-            return FAQS[key]
+def try_answer(user_msg: str, index: IndexSnapshot | None = None) -> str | None:
+    """Respuesta de FAQ si el mensaje coincide con una palabra clave y no nombra productos:
+    "panel led para empresa" o "panel 60x60 envio a cali" siguen a la búsqueda."""
+    key = match(user_msg)
+    _STATS["checks"] += 1
+    if key is None:
+        return None
+    if catalog_terms(user_msg, _RULE_TOKENS, index):
+        _STATS["catalog"] += 1
+        return None
+    _STATS["hits"] += 1
+    _STATS["by_key"][key] += 1
+    return FAQS[key]
 
-    return None
+@router.get("/stats")
+def faq_stats():
+    checks, hits = _STATS["checks"], _STATS["hits"]
+    return {**_STATS, "hit_rate": round(hits / checks, 4) if checks else 0.0}
@@ -0,0 +1,14 @@
+# backend/routers/products.py
+from fastapi import APIRouter, HTTPException, Query
+from backend.services.search_service import current_index, similar_products
+
+router = APIRouter(prefix="/products", tags=["products"])
+
+@router.get("/{code}/similar")
+def similar(code: str, limit: int = Query(5, ge=1, le=20)):
+    """Productos parecidos (precalculados con el snapshot, ver similar_index); hasta ECOLITE_SIMILAR_K."""
+    snap = current_index()
+    items = similar_products(code, limit, snap)
+    if items is None:
+        raise HTTPException(status_code=404, detail="product not found")
+    return {"code": code, "version": snap.version, "similar": items}
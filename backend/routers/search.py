@@ -0,0 +1,20 @@
+# backend/routers/search.py
+import os
+from fastapi import APIRouter, Query, Response
+from backend.services.search_service import current_index
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+# las sugerencias cambian poco: el navegador puede reusarlas (la URL lleva la consulta)
+SUGGEST_MAX_AGE_S = int(os.getenv("ECOLITE_SUGGEST_MAX_AGE_S", "300"))
+
+@router.get("/suggest")
+def suggest(response: Response, q: str = Query("", max_length=100), limit: int = Query(8, ge=1, le=20)):
+    snap = current_index()
+    items = snap.suggest.suggest(q, limit)
+    response.headers["Cache-Control"] = f"public, max-age={SUGGEST_MAX_AGE_S}"
+    return {
+        "q": q,
+        "version": snap.version,
+        "suggestions": [{"text": s.text, "kind": s.kind, "code": s.code} for s in items],
+    }
@@ -0,0 +1,66 @@
+# backend/services/admission.py
+"""Control de admisión para llamadas lentas (el LLM).
+
+Como mucho `limit` llamadas en curso y `queue_max` esperando turno; con la cola llena la
+llamada se rechaza de inmediato (`Shed`) y la espera de un turno está acotada por el
+plazo de quien la pide. Así, si el proveedor se pone lento, los requests no se acumulan:
+chat responde con los productos ya buscados y un texto fijo.
+
+ECOLITE_LLM_MAX_INFLIGHT=0 desactiva el límite (la cola y el plazo siguen aplicando al
+resto del request).
+"""
+from __future__ import annotations
+import asyncio, os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+LLM_MAX_INFLIGHT = int(os.getenv("ECOLITE_LLM_MAX_INFLIGHT", "32"))
+LLM_MAX_QUEUE = int(os.getenv("ECOLITE_LLM_MAX_QUEUE", "64"))
+# plazo por request (desde que llega) para tener la respuesta del LLM o su primer fragmento
+LLM_DEADLINE_S = float(os.getenv("ECOLITE_LLM_DEADLINE_S", "8"))
+
+class Shed(Exception):
+    """Llamada rechazada: cola llena o plazo vencido."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+class AdmissionGate:
+    def __init__(self, name: str, limit: int, queue_max: int):
+        self.name, self.limit, self.queue_max = name, limit, queue_max
+        self._sem = asyncio.Semaphore(limit) if limit > 0 else None
+        self.active = self.waiting = self.admitted = 0
+        self.shed: Dict[str, int] = {"queue_full": 0, "queue_timeout": 0, "deadline": 0}
+
+    def reject(self, reason: str) -> Shed:
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        return Shed(reason)
+
+    @asynccontextmanager
+    async def slot(self, timeout: float) -> AsyncIterator[None]:
+        if self._sem is not None:
+            if self._sem.locked() and self.waiting >= self.queue_max:
+                raise self.reject("queue_full")
+            self.waiting += 1
+            try:
+                if self._sem.locked():
+                    await asyncio.wait_for(self._sem.acquire(), max(0.0, timeout))
+                else:
+                    await self._sem.acquire()
+            except asyncio.TimeoutError:
+                raise self.reject("queue_timeout") from None
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            if self._sem is not None:
+                self._sem.release()
+
+    def stats(self) -> Dict:
+        return {"limit": self.limit, "queue_max": self.queue_max, "in_flight": self.active,
+                "queued": self.waiting, "admitted": self.admitted, "shed": dict(self.shed)}
@@ -0,0 +1,116 @@
+# backend/services/catalog_changes.py
+"""Cambios incrementales del catálogo (altas, bajas, cambios de precio) sin reconstruir el índice.
+
+Cada lote que llega por /admin/products se agrega como una línea a `productos.changes.jsonl`
+(junto al catálogo, o ECOLITE_CHANGES_PATH):
+
+    {"base": 7, "delete": ["CODE1"], "upsert": {"CODE2": {"price": "$10.000"}}}
+
+`base` es la generación del snapshot en disco sobre la que aplica el lote; los `upsert` son
+parches que se fusionan con el registro existente. Cada worker lee el log desde su última
+posición y aplica los lotes sobre su índice (ver search_service). La compactación vuelca los
+lotes pendientes en productos.json, reconstruye el snapshot y reemplaza el log por uno vacío;
+escrituras y compactación se serializan con un flock sobre `productos.changes.lock`.
+"""
+from __future__ import annotations
+import fcntl, json, logging, os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from backend.services import catalog_snapshot
+from backend.services.product_loader import load_datasheets, prepare_record, raw_record, read_catalog
+
+logger = logging.getLogger("uvicorn.error")
+
+CHANGES_ENV_PATH = os.getenv("ECOLITE_CHANGES_PATH")
+# lotes pendientes a partir de los cuales se compacta en segundo plano
+COMPACT_AFTER = int(os.getenv("ECOLITE_COMPACT_AFTER", "200"))
+
+# (inodo, offset) hasta donde se leyó el log; None = desde el principio
+LogPos = Optional[Tuple[int, int]]
+
+def changes_path(source: Path) -> Path:
+    return Path(CHANGES_ENV_PATH) if CHANGES_ENV_PATH else source.with_suffix(".changes.jsonl")
+
+@contextmanager
+def locked(source: Path) -> Iterator[None]:
+    """Exclusión entre workers para escribir el log o compactar."""
+    with open(changes_path(source).with_suffix(".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def append(source: Path, upserts: Mapping[str, dict], deletes: Iterable[str]) -> int:
+    """Agrega un lote al log y devuelve la generación base a la que quedó asociado."""
+    with locked(source):
+        base = catalog_snapshot.disk_generation(source)
+        line = json.dumps({"base": base, "delete": list(deletes), "upsert": dict(upserts)}, ensure_ascii=False)
+        with open(changes_path(source), "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    return base
+
+def read(source: Path, pos: LogPos) -> Tuple[List[Dict], LogPos]:
+    """Lotes agregados desde `pos` (desde el principio si el log fue reemplazado)."""
+    try:
+        f = open(changes_path(source), "rb")
+    except FileNotFoundError:
+        return [], None
+    with f:
+        st = os.fstat(f.fileno())
+        offset = pos[1] if pos and pos[0] == st.st_ino and pos[1] <= st.st_size else 0
+        f.seek(offset)
+        data = f.read()
+    # solo líneas completas: otro worker puede estar escribiendo la última
+    end = data.rfind(b"\n") + 1
+    batches = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    return batches, (st.st_ino, offset + end)
+
+def batch_records(productos: Mapping[str, dict], batch: Dict, sheets: Dict[str, dict]) -> Tuple[Dict[str, dict], List[str]]:
+    """Lote -> (registros normalizados a insertar/reemplazar, códigos a borrar) sobre `productos`."""
+    deletes = [str(c) for c in batch.get("delete") or []]
+    gone = set(deletes)
+    upserts: Dict[str, dict] = {}
+    for code, patch in (batch.get("upsert") or {}).items():
+        old = None if code in gone else productos.get(code)
+        upserts[code] = prepare_record(code, {**(raw_record(old) if old else {}), **patch}, sheets)
+    return upserts, deletes
+
+def compact(source: Path, base: int) -> int:
+    """Vuelca en el JSON del catálogo los lotes pendientes sobre `base`; devuelve cuántos.
+
+    Llamar dentro de `locked`; después de reconstruir el snapshot, `reset_log`.
+    """
+    batches = [b for b in read(source, None)[0] if b.get("base") == base]
+    if not batches:
+        return 0
+    data, sheets = read_catalog(source), load_datasheets(source)
+    for b in batches:
+        try:
+            batch_records(data, b, sheets)
+        except Exception:
+            # el mismo lote que los workers saltearon al aplicarlo: no llega al JSON
+            logger.exception("Lote del log de cambios inválido; se descarta al compactar.")
+            continue
+        for code in b.get("delete") or []:
+            data.pop(code, None)
+        for code, patch in (b.get("upsert") or {}).items():
+            data[code] = {**data.get(code, {}), **patch}
+    tmp = source.with_name(f"{source.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, source)
+    return len(batches)
+
+def reset_log(source: Path):
+    """Reemplaza el log por uno vacío (inodo nuevo: los lectores vuelven a empezar)."""
+    path = changes_path(source)
+    if not path.exists():
+        return
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(b"")
+    os.replace(tmp, path)
@@ -0,0 +1,148 @@
+# backend/services/catalog_snapshot.py
+"""Snapshot binario del catálogo normalizado + índice de búsqueda.
+
+Evita en cada arranque/reload el `json.load`, la normalización por registro y la
+construcción del índice. El archivo (`productos.snapshot` junto al catálogo, o
+ECOLITE_SNAPSHOT_PATH) lleva una cabecera con el formato, el hash de las fuentes
+(`productos.json` + `datasheets.json`) y una generación que sube en cada escritura
+(es la versión del catálogo); si formato u hash no coinciden se ignora y se reconstruye.
+
+El cuerpo es el índice empaquetado de `packed_index` y se abre con mmap de solo
+lectura: todos los workers que abren el mismo archivo comparten las páginas.
+
+    python -m backend.services.catalog_snapshot     # reconstruye el snapshot
+"""
+from __future__ import annotations
+import hashlib, json, logging, mmap, os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from backend.services.packed_index import PackedIndex, PackedRecords
+
+logger = logging.getLogger("uvicorn.error")
+
+SNAPSHOT_FORMAT = 3
+SNAPSHOT_ENV_PATH = os.getenv("ECOLITE_SNAPSHOT_PATH")
+# ECOLITE_SNAPSHOT_WRITE=0 desactiva la escritura automática (p. ej. filesystem de solo lectura)
+WRITE_SNAPSHOT = os.getenv("ECOLITE_SNAPSHOT_WRITE", "1") != "0"
+
+_MAGIC = b"ECOLITE-SNAPSHOT\n"
+_ALIGN = 8
+
+# ((ruta, hash de fuentes, stamp), registros) del último snapshot abierto en este proceso
+_LOADED: Tuple[Tuple[Path, str, Tuple[int, int]], PackedRecords] | None = None
+
+def snapshot_path(source: Path) -> Path:
+    return Path(SNAPSHOT_ENV_PATH) if SNAPSHOT_ENV_PATH else source.with_suffix(".snapshot")
+
+def _sources(source: Path) -> List[Path]:
+    from backend.services.product_loader import datasheets_path
+    return [source, datasheets_path(source)]
+
+def source_hash(source: Path) -> str:
+    h = hashlib.sha1(f"format={SNAPSHOT_FORMAT}".encode())
+    for p in _sources(source):
+        h.update(p.name.encode())
+        h.update(p.read_bytes() if p.exists() else b"-")
+    return h.hexdigest()
+
+def _stamp(st: os.stat_result) -> Tuple[int, int]:
+    # inodo + mtime: cada escritura es un rename de un archivo nuevo
+    return st.st_ino, st.st_mtime_ns
+
+def snapshot_stamp(source: Path) -> Optional[Tuple[int, int]]:
+    """Identifica la versión del archivo en disco sin leerlo (None si no existe)."""
+    try:
+        return _stamp(os.stat(snapshot_path(source)))
+    except OSError:
+        return None
+
+def _read_header(f) -> Optional[Dict]:
+    if f.readline() != _MAGIC:
+        return None
+    return json.loads(f.readline())
+
+def _open(path: Path, digest: str | None) -> Optional[PackedRecords]:
+    """Abre `path` con mmap; None si no es un snapshot vigente (formato u hash distintos)."""
+    try:
+        with open(path, "rb") as f:
+            header = _read_header(f)
+            if not header or header.get("format") != SNAPSHOT_FORMAT or (digest and header.get("source_hash") != digest):
+                return None
+            start = f.tell() + (-f.tell() % _ALIGN)
+            stamp = _stamp(os.fstat(f.fileno()))
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        logger.warning("Snapshot %s inválido (%s); se reconstruye.", path, e)
+        return None
+    buf = memoryview(mm)[start:]
+    return PackedRecords(PackedIndex(buf, header["layout"], owner=mm), header.get("generation", 0), stamp)
+
+def disk_generation(source: Path) -> int:
+    """Generación del snapshot actual en disco (0 si no hay o no se puede leer)."""
+    try:
+        with open(snapshot_path(source), "rb") as f:
+            return int((_read_header(f) or {}).get("generation", 0))
+    except (OSError, ValueError):
+        return 0
+
+def load_records(source: Path) -> Optional[PackedRecords]:
+    """Registros (vista de solo lectura) si hay un snapshot vigente para `source`."""
+    global _LOADED
+    path = snapshot_path(source)
+    stamp = snapshot_stamp(source)
+    if stamp is None:
+        return None
+    key = (path, source_hash(source), stamp)
+    if _LOADED and _LOADED[0] == key:
+        return _LOADED[1]
+    recs = _open(path, key[1])
+    if recs is not None:
+        _LOADED = ((path, key[1], recs.stamp), recs)
+    return recs
+
+def save(source: Path, layout: Dict, body: bytes, generation: int | None = None) -> Optional[PackedRecords]:
+    """Escribe el snapshot de forma atómica (tmp + rename) y lo devuelve abierto con mmap.
+
+    `generation` por defecto es la del snapshot en disco + 1.
+    Es best-effort: si no se puede escribir devuelve None y el llamador usa el buffer en memoria.
+    """
+    global _LOADED
+    if not WRITE_SNAPSHOT:
+        return None
+    path = snapshot_path(source)
+    digest = source_hash(source)
+    header = {"format": SNAPSHOT_FORMAT, "source_hash": digest, "generation": generation or disk_generation(source) + 1, "layout": layout}
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(_MAGIC)
+            f.write(json.dumps(header).encode() + b"\n")
+            f.write(b"\0" * (-f.tell() % _ALIGN))
+            f.write(body)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning("No se pudo escribir el snapshot %s: %s", path, e)
+        tmp.unlink(missing_ok=True)
+        return None
+    recs = _open(path, digest)
+    if recs is not None:
+        _LOADED = ((path, digest, recs.stamp), recs)
+    return recs
+
+def in_memory(layout: Dict, body: bytes, generation: int = 0) -> PackedRecords:
+    """Mismo formato sobre un buffer en memoria (cuando no se puede escribir el snapshot)."""
+    return PackedRecords(PackedIndex(memoryview(body), layout), generation)
+
+def build() -> Optional[PackedRecords]:
+    """Reconstruye el snapshot desde las fuentes JSON, ignorando el existente."""
+    from backend.services import product_loader, search_service
+
+    source = product_loader._resolve_path()
+    productos = product_loader._load_from_disk(use_snapshot=False)
+    return save(source, *search_service._build_index(productos))
+
+if __name__ == "__main__":
+    out = build()
+    print(f"Snapshot escrito: {len(out)} productos" if out is not None else
+          "Snapshot no escrito (ECOLITE_SNAPSHOT_WRITE=0 o error)")
@@ -1,30 +1,135 @@
 # backend/services/context_builder.py
-import json
+"""Prompt del LLM en formato compacto.
 
-BASE_RULES = """
-Eres el asistente de Ecolite (Colombia). Sé claro, breve y profesional con tono cercano.
+- SYSTEM_PROMPT es fijo (mismos bytes en cada llamada) y va primero, como mensaje de
+  sistema aparte: es el prefijo que el proveedor puede cachear.
+- Lo variable va en el mensaje de usuario con claves cortas (q, pag, pref, prods) y los
+  candidatos como `P1|nombre|precio`, sin URLs ni imágenes (las tarjetas ya las muestran).
+- El modelo se refiere a los productos como [P1]; `expand_ids` / `IdExpander` lo
+  reemplazan por el nombre al volver.
+- Se respeta un presupuesto de tokens (ECOLITE_PROMPT_TOKEN_BUDGET) con una estimación
+  local: tiktoken si está instalado, si no una aproximación por palabras.
+
+`python -m bench.prompt_tokens` compara los tokens contra el formato anterior.
+"""
+from __future__ import annotations
+import math, os, re
+from typing import Dict, List, NamedTuple
+from backend.services.metrics import inc, timed_fn
+
+# Súbelo al cambiar SYSTEM_PROMPT o el formato del prompt: es parte de la clave de reply_cache
+PROMPT_VERSION = 2
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("ECOLITE_PROMPT_TOKEN_BUDGET", "600"))
+NAME_MAX_CHARS = 80
+# la consulta va recortada (caracteres y tokens estimados): un mensaje largo no puede dejar
+# sin lugar a los candidatos
+QUERY_MAX_CHARS, QUERY_MAX_TOKENS = 200, 80
+
+SYSTEM_PROMPT = """Eres el asistente de Ecolite (Colombia). Sé claro, breve y profesional con tono cercano.
 Usa emojis con moderación (💡👌✨). Ayuda a elegir el producto correcto.
 
 REGLAS:
-- SOLO puedes recomendar productos de la sección CANDIDATOS_PROD que te pasa el sistema.
-- No inventes productos.
+- SOLO puedes recomendar productos de `prods`. No inventes productos.
+- Para nombrar un producto escribe su id entre corchetes, p. ej. [P1].
 - Si faltan datos (espacio, instalación, vatios, temperatura, presupuesto), haz 1 pregunta concreta.
-"""
+- Responde en 1–2 frases. Si `prods` está vacío, pide un dato faltante.
 
-def build_context(state: dict, candidates: list[dict]) -> str:
-    state_snapshot = {
-        "ultima_consulta": state.get("last_user_msg"),
-        "preferencias": state.get("preferencias"),
-        "page": state.get("page"),
-    }
-    return f"""
-{BASE_RULES}
+Formato del mensaje: q=consulta, pag=página (0 = primera), pref=preferencias,
+prods=candidatos (id|nombre|precio)."""
 
-ESTADO:
-{json.dumps(state_snapshot, ensure_ascii=False, indent=2)}
+class Prompt(NamedTuple):
+    system: str
+    user: str
+    ids: Dict[str, str]  # "P1" -> nombre del producto
+    tokens: int          # estimación (system + user)
 
-CANDIDATOS_PROD (elige SOLO de esta lista):
-{json.dumps(candidates, ensure_ascii=False, indent=2)}
+try:
+    import tiktoken
+    _ENC = tiktoken.get_encoding("o200k_base")  # la primera vez descarga el vocabulario
 
-Redacta una respuesta corta (1–2 frases). Si no hay productos, pide un dato faltante.
-"""
+    def estimate_tokens(text: str) -> int:
+        return len(_ENC.encode(text))
+    TOKENIZER = "tiktoken"
+except Exception:  # sin tiktoken o sin poder bajar el vocabulario
+    TOKENIZER = "aprox"
+    _PIECES = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+    def estimate_tokens(text: str) -> int:
+        # ~4 letras por token en palabras; signos, emojis y no-ASCII cuentan aparte
+        n = 0
+        for p in _PIECES.findall(text or ""):
+            n += math.ceil(len(p) / 4) if p[0].isalnum() else 1
+            n += sum(1 for c in p if ord(c) > 0x2000)
+        return n
+
+_SYSTEM_TOKENS = estimate_tokens(SYSTEM_PROMPT)
+
+def _prefs(prefs: dict | None) -> str:
+    return ";".join(f"{k}={v}" for k, v in (prefs or {}).items() if v not in (None, "", [], {}))
+
+def _clip(text: str, max_chars: int) -> str:
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= max_chars else text[: max_chars - 1].rstrip() + "…"
+
+def _query(msg) -> str:
+    q, n = _clip(msg, QUERY_MAX_CHARS), QUERY_MAX_CHARS
+    while estimate_tokens(q) > QUERY_MAX_TOKENS and n > 10:
+        n = n * 3 // 4
+        q = _clip(msg, n)
+    return q
+
+def _line(pid: str, c: dict, name_max: int) -> str:
+    return f"{pid}|{_clip(c.get('name') or c.get('code'), name_max)}|{c.get('price') or '-'}"
+
+@timed_fn("prompt.build")
+def build_prompt(state: dict, candidates: List[dict], budget: int = PROMPT_TOKEN_BUDGET) -> Prompt:
+    head = [f"q: {_query(state.get('last_user_msg'))}", f"pag: {state.get('page') or 0}"]
+    prefs = _prefs(state.get("preferencias"))
+    if prefs:
+        head.append(f"pref: {prefs}")
+
+    ids = {f"P{i}": str(c.get("name") or c.get("code") or "") for i, c in enumerate(candidates, 1)}
+    # sobre presupuesto: primero se acortan los nombres, después se quitan los últimos candidatos
+    for name_max in (NAME_MAX_CHARS, 40):
+        lines = [_line(pid, c, name_max) for pid, c in zip(ids, candidates)]
+        user = "\n".join(head + ["prods:"] + lines)
+        tokens = _SYSTEM_TOKENS + estimate_tokens(user)
+        if tokens <= budget:
+            break
+    while tokens > budget and len(lines) > 1:
+        lines.pop()
+        user = "\n".join(head + ["prods:"] + lines)
+        tokens = _SYSTEM_TOKENS + estimate_tokens(user)
+    ids = {pid: name for pid, name in list(ids.items())[: len(lines)]}
+    inc("prompt.tokens", tokens)
+    if len(lines) < len(candidates):
+        inc("prompt.truncated")
+    return Prompt(SYSTEM_PROMPT, user, ids, tokens)
+
+_ID_REF = re.compile(r"\[(P\d{1,2})\]")
+
+def expand_ids(text: str, ids: Dict[str, str]) -> str:
+    """[P1] -> nombre del producto (ids desconocidos quedan como están)."""
+    return _ID_REF.sub(lambda m: ids.get(m.group(1), m.group(0)), text or "")
+
+class IdExpander:
+    """`expand_ids` para texto que llega por fragmentos: retiene un "[P1" incompleto hasta
+    que llega el resto."""
+
+    def __init__(self, ids: Dict[str, str]):
+        self.ids, self.buf = ids, ""
+
+    def feed(self, delta: str) -> str:
+        text = self.buf + delta
+        cut = text.rfind("[")
+        # un "[" sin cerrar cerca del final puede ser el comienzo de una referencia
+        if cut >= 0 and "]" not in text[cut:] and len(text) - cut <= 5:
+            self.buf, text = text[cut:], text[:cut]
+        else:
+            self.buf = ""
+        return expand_ids(text, self.ids)
+
+    def flush(self) -> str:
+        text, self.buf = self.buf, ""
+        return expand_ids(text, self.ids)
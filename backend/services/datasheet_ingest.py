@@ -0,0 +1,178 @@
+# backend/services/datasheet_ingest.py
+"""Ingesta offline de fichas técnicas (exportes camelot `_debug_pdf/camelot_NN.csv`).
+
+Uso:
+    python -m backend.services.datasheet_ingest [--src DIR] [--out FILE] [--workers N] [--force]
+
+Cada CSV se parsea en un pool de procesos (Latin-1, columnas desiguales). Los
+resultados se cachean por hash SHA-1 del archivo, así que re-ejecutar tras cambiar
+una ficha solo vuelve a parsear ese archivo. Las filas se unen a PRODUCTOS por
+`code` (o tags / variantes `CODE-X`) y se escribe `datasheets.json` junto al
+catálogo; `product_loader` lo fusiona en `rec["specs"]` antes de `_postprocess_record`.
+"""
+from __future__ import annotations
+import argparse, csv, hashlib, json, os, re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from backend.services.specs import parse_price, parse_specs
+
+DEFAULT_SRC = Path(os.getenv("ECOLITE_DATASHEETS_DIR") or Path(__file__).parent.parent.parent / "_debug_pdf")
+OUT_NAME = "datasheets.json"
+CACHE_NAME = "datasheets.cache.json"
+
+_REF = re.compile(r"[A-Z0-9][A-Z0-9\-./]{2,}")
+_FIRST_NUM = re.compile(r"\d[\d.,]*")
+
+# Columnas estables al inicio de cada fila; el resto (ficha, dimensiones, empaque,
+# garantía, precio) se desplaza según la página y se reconoce por contenido.
+_PREFIX = ("ref", "material", "color", "electrical", "lumen", "beam_angle", "cct", "lifetime")
+
+def _int(s: str) -> Optional[int]:
+    m = _FIRST_NUM.search(s or "")
+    if not m:
+        return None
+    return int(m.group(0).split(",")[0].replace(".", ""))
+
+def _clean(s: str) -> str:
+    return re.sub(r"\s+", " ", s or "").strip()
+
+def parse_row(row: List[str]) -> Optional[Dict]:
+    """Una fila de tabla -> dict de specs, o None si no es una fila de producto."""
+    cells = [_clean(c) for c in row]
+    if len(cells) < len(_PREFIX) or not _REF.fullmatch(cells[0]) or not cells[3]:
+        return None  # encabezados, secciones (*PANELES) y celdas fusionadas por camelot
+    if cells[0] == "REFERENCIA":
+        return None
+    raw = dict(zip(_PREFIX, cells))
+    electrical = parse_specs(raw["electrical"].lower())
+    cct = re.fullmatch(r"(\d{4})\s*K", raw["cct"])
+    out: Dict = {
+        "ref": raw["ref"],
+        "material": raw["material"] or None,
+        "color": raw["color"] or None,
+        "electrical": raw["electrical"],
+        "watts": electrical["watts"],
+        "ip": electrical["ip"],
+        "volt_min": electrical["volt_min"],
+        "volt_max": electrical["volt_max"],
+        "lumen": _int(raw["lumen"]),
+        "beam_angle": _int(raw["beam_angle"]),
+        "cct": int(cct.group(1)) if cct else None,
+        "cct_label": raw["cct"] if raw["cct"] not in ("", "N/A", "-") else None,
+        "lifetime_h": _int(raw["lifetime"]) if raw["lifetime"].upper().endswith("H") else None,
+    }
+    tail = [c for c in cells[len(_PREFIX):] if c and c.upper() != "FICHA TÉCNICA"]
+    for c in tail:
+        up = c.upper()
+        if c.startswith("$"):
+            out["list_price"] = parse_price(c)[0]
+        elif "AÑO" in up:
+            out["warranty_years"] = _int(c)
+        elif "MM" in up or "*" in c or "Ø" in c:
+            out["dimensions"] = c
+        elif c.isdigit():
+            out["pack_units"] = int(c)
+    return out
+
+def parse_file(path: str) -> Tuple[str, List[Dict]]:
+    """Parsea un CSV completo (se ejecuta en los workers del pool)."""
+    rows: List[Dict] = []
+    with open(path, "r", encoding="latin-1", newline="") as f:
+        for row in csv.reader(f):
+            rec = parse_row(row)
+            if rec:
+                rec["source"] = Path(path).name
+                rows.append(rec)
+    return Path(path).name, rows
+
+def _sha1(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+def _merge(rows: List[Dict]) -> Dict:
+    """Varias filas (variantes -C/-N/-F) del mismo producto -> un dict de specs."""
+    out: Dict = {"refs": sorted({r["ref"] for r in rows}), "sources": sorted({r["source"] for r in rows})}
+    keys = {k for r in rows for k in r} - {"ref", "source"}
+    for k in sorted(keys):
+        vals = [r[k] for r in rows if r.get(k) is not None]
+        uniq = list(dict.fromkeys(vals))
+        # un valor único se usa tal cual; si las variantes difieren queda como lista de opciones
+        if len(uniq) == 1:
+            out[k] = uniq[0]
+        elif uniq:
+            out[k + "_options"] = uniq
+    return out
+
+def join_to_catalog(rows: List[Dict], productos: Dict[str, dict]) -> Dict[str, Dict]:
+    """Une filas de fichas a productos por código exacto, tag o variante (`CODE-X`)."""
+    by_ref: Dict[str, List[Dict]] = {}
+    for r in rows:
+        by_ref.setdefault(r["ref"].upper(), []).append(r)
+    # prefijos de cada referencia en los guiones: ECO120SPV6-C -> ECO120SPV6
+    by_prefix: Dict[str, List[str]] = {}
+    for ref in by_ref:
+        parts = ref.split("-")
+        for i in range(1, len(parts)):
+            by_prefix.setdefault("-".join(parts[:i]), []).append(ref)
+
+    out: Dict[str, Dict] = {}
+    for code, p in productos.items():
+        keys = {str(code).upper(), *(str(t).upper() for t in (p.get("tags") or []))}
+        refs = {k for k in keys if k in by_ref}
+        if not refs:
+            for k in keys:
+                refs.update(by_prefix.get(k, ()))
+        if refs:
+            out[code] = _merge([r for ref in sorted(refs) for r in by_ref[ref]])
+    return out
+
+def ingest(src: Path = DEFAULT_SRC, out: Path | None = None, workers: int | None = None, force: bool = False) -> Dict[str, int]:
+    from backend.services.product_loader import _resolve_path
+
+    catalog_path = _resolve_path()
+    out = out or catalog_path.parent / OUT_NAME
+    cache_path = out.parent / CACHE_NAME
+    cache: Dict[str, Dict] = {}
+    if cache_path.exists() and not force:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+
+    files = {p.name: p for p in sorted(src.glob("*.csv"))}
+    hashes = {name: _sha1(p) for name, p in files.items()}
+    stale = [name for name in files if cache.get(name, {}).get("sha1") != hashes[name]]
+    cache = {name: entry for name, entry in cache.items() if name in files}
+
+    if stale:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for name, rows in pool.map(parse_file, [str(files[n]) for n in stale]):
+                cache[name] = {"sha1": hashes[name], "rows": rows}
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False)
+
+    # el catálogo se lee crudo: solo hacen falta code y tags
+    with open(catalog_path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    productos = raw if isinstance(raw, dict) else {str(it.get("code") or it.get("sku")): it for it in raw}
+
+    rows = [r for name in sorted(cache) for r in cache[name]["rows"]]
+    enriched = join_to_catalog(rows, productos)
+    tmp = out.with_suffix(out.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(enriched, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, out)
+    return {"files": len(files), "parsed": len(stale), "rows": len(rows), "products": len(enriched)}
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Ingesta de fichas técnicas camelot -> datasheets.json")
+    ap.add_argument("--src", type=Path, default=DEFAULT_SRC, help="directorio con camelot_NN.csv")
+    ap.add_argument("--out", type=Path, default=None, help="archivo de salida (por defecto junto al catálogo)")
+    ap.add_argument("--workers", type=int, default=None, help="procesos del pool (por defecto: nº de CPUs)")
+    ap.add_argument("--force", action="store_true", help="ignora la caché y re-parsea todo")
+    args = ap.parse_args(argv)
+    stats = ingest(args.src, args.out, args.workers, args.force)
+    print(f"{stats['files']} CSV ({stats['parsed']} parseados), {stats['rows']} filas, "
+          f"{stats['products']} productos enriquecidos")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# backend/services/metrics.py
+"""Métricas del proceso en formato de texto de Prometheus (sin dependencias).
+
+    with timed("search.score"):      # bloque
+        ...
+    @timed_fn("prompt.build")        # función (sync o async)
+    def build_prompt(...): ...
+
+Los tiempos van al histograma `ecolite_stage_seconds{stage=...}`. Los contadores se suman
+con `inc` y los valores que ya llevan otros módulos (hits de cachés, versión del catálogo)
+se leen al exportar, con `register_collector`.
+
+ECOLITE_METRICS=0 los apaga: `timed` devuelve un contexto nulo compartido y `timed_fn`
+deja la función intacta (sin costo por llamada).
+"""
+from __future__ import annotations
+import functools, inspect, os, threading, time
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, List, Tuple
+
+METRICS_ENABLED = os.getenv("ECOLITE_METRICS", "1").strip().lower() not in ("0", "off", "false")
+
+# segundos: de microsegundos (tokenizar) a segundos (LLM)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = BUCKETS):
+        self.name, self.help, self.buckets = name, help, buckets
+        self._series: Dict[Labels, List[float]] = {}  # labels -> [conteo por bucket..., total, suma]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    s[i] += 1
+                    break
+            s[-2] += 1
+            s[-1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(k, list(s)) for k, s in sorted(self._series.items())]
+        for labels, s in series:
+            acc = 0.0
+            for b, c in zip(self.buckets, s):
+                acc += c
+                yield f"{self.name}_bucket{_fmt(labels + (('le', repr(b)),))} {acc:g}"
+            yield f"{self.name}_bucket{_fmt(labels + (('le', '+Inf'),))} {s[-2]:g}"
+            yield f"{self.name}_count{_fmt(labels)} {s[-2]:g}"
+            yield f"{self.name}_sum{_fmt(labels)} {s[-1]:.6f}"
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self._series: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            series = sorted(self._series.items())
+        for labels, v in series:
+            yield f"{self.name}{_fmt(labels)} {v:g}"
+
+def _fmt(labels: Labels) -> str:
+    if not labels:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels) + "}"
+
+STAGE_SECONDS = Histogram("ecolite_stage_seconds", "Duración por etapa (búsqueda, prompt, LLM, carga de catálogo, índice).")
+REQUEST_SECONDS = Histogram("ecolite_request_seconds", "Duración de requests HTTP por ruta.")
+REQUESTS = Counter("ecolite_requests_total", "Requests HTTP por ruta y código de estado.")
+EVENTS = Counter("ecolite_events_total", "Eventos contados en el camino caliente (hits/misses de cachés, atajos).")
+
+# -> [(nombre, tipo, ayuda, [(labels, valor)])]
+Collector = Callable[[], List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+_COLLECTORS: List[Collector] = []
+
+def register_collector(fn: Collector) -> Collector:
+    _COLLECTORS.append(fn)
+    return fn
+
+class _Timer:
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.t0, stage=self.stage)
+        return False
+
+_NULL = nullcontext()
+
+def timed(stage: str):
+    return _Timer(stage) if METRICS_ENABLED else _NULL
+
+def observe(stage: str, seconds: float):
+    if METRICS_ENABLED:
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+def inc(event: str, amount: float = 1.0):
+    if METRICS_ENABLED:
+        EVENTS.inc(amount, event=event)
+
+def timed_fn(stage: str):
+    def wrap(fn):
+        if not METRICS_ENABLED:
+            return fn
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def run_async(*a, **kw):
+                with _Timer(stage):
+                    return await fn(*a, **kw)
+            return run_async
+
+        @functools.wraps(fn)
+        def run(*a, **kw):
+            with _Timer(stage):
+                return fn(*a, **kw)
+        return run
+    return wrap
+
+def render() -> str:
+    lines: List[str] = []
+    for m in (REQUESTS, REQUEST_SECONDS, STAGE_SECONDS, EVENTS):
+        lines.extend(m.render())
+    for fn in _COLLECTORS:
+        for name, kind, help, samples in fn():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, v in samples:
+                lines.append(f"{name}{_fmt(tuple(sorted(labels.items())))} {v:g}")
+    return "\n".join(lines) + "\n"
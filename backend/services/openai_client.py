@@ -1,18 +1,133 @@
 # backend/services/openai_client.py
-import os
+"""Cliente OpenAI compartido por proceso.
+
+Un único `AsyncOpenAI` (y un `OpenAI` para uso síncrono) por worker, con pool HTTP
+keep-alive, timeouts y reintentos configurables. Las rutas async esperan la respuesta
+sin ocupar un hilo del threadpool durante todo el round-trip.
+
+OPENAI_BASE_URL permite apuntar al stub local (ver openai_stub) para probar sin red.
+"""
+from __future__ import annotations
+import os, logging, time
+from typing import AsyncIterator, Dict, List
+
+from backend.services.metrics import inc, observe, timed_fn
+
+logger = logging.getLogger("uvicorn.error")
+
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+OPENAI_TIMEOUT_S = float(os.getenv("OPENAI_TIMEOUT_S", "30"))
+OPENAI_CONNECT_TIMEOUT_S = float(os.getenv("OPENAI_CONNECT_TIMEOUT_S", "5"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_KEEPALIVE_S = float(os.getenv("OPENAI_KEEPALIVE_S", "30"))
+
+FALLBACK_REPLY = "Aquí tienes algunas opciones recomendadas:"
+
+_CLIENT = None        # OpenAI (síncrono)
+_ASYNC_CLIENT = None  # AsyncOpenAI
+
+def _messages(system_prompt: str, user_message: str | None) -> List[Dict[str, str]]:
+    msgs = [{"role": "system", "content": system_prompt}]
+    if user_message:
+        msgs.append({"role": "user", "content": user_message})
+    return msgs
+
+def _client_options() -> Dict:
+    import httpx
+    return {
+        "api_key": OPENAI_API_KEY,
+        "base_url": OPENAI_BASE_URL,
+        "max_retries": OPENAI_MAX_RETRIES,
+        "timeout": httpx.Timeout(OPENAI_TIMEOUT_S, connect=OPENAI_CONNECT_TIMEOUT_S),
+    }
+
+def _limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_S,
+    )
 
+def _sync_client():
+    global _CLIENT
+    if _CLIENT is None:
+        from openai import OpenAI, DefaultHttpxClient
+        _CLIENT = OpenAI(**_client_options(), http_client=DefaultHttpxClient(limits=_limits()))
+    return _CLIENT
+
+def _async_client():
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is None:
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        _ASYNC_CLIENT = AsyncOpenAI(**_client_options(), http_client=DefaultAsyncHttpxClient(limits=_limits()))
+    return _ASYNC_CLIENT
+
+async def aclose():
+    """Cierra el pool del cliente async (shutdown de la app)."""
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is not None:
+        await _ASYNC_CLIENT.close()
+        _ASYNC_CLIENT = None
+
+@timed_fn("llm.ask")
 def ask_chatgpt(system_prompt: str, user_message: str | None = None) -> str:
     if not OPENAI_API_KEY:
-        return "Aquí tienes algunas opciones recomendadas:"
+        return FALLBACK_REPLY
+    from openai import OpenAIError
+    try:
+        resp = _sync_client().chat.completions.create(
+            model=OPENAI_MODEL, messages=_messages(system_prompt, user_message), temperature=0.3
+        )
+        return resp.choices[0].message.content or FALLBACK_REPLY
+    except OpenAIError as e:
+        logger.warning("OpenAI falló (%s): %s", type(e).__name__, e)
+        inc("llm.error")
+        return FALLBACK_REPLY
+
+@timed_fn("llm.ask")
+async def ask_chatgpt_async(system_prompt: str, user_message: str | None = None) -> str:
+    if not OPENAI_API_KEY:
+        return FALLBACK_REPLY
+    from openai import OpenAIError
+    try:
+        resp = await _async_client().chat.completions.create(
+            model=OPENAI_MODEL, messages=_messages(system_prompt, user_message), temperature=0.3
+        )
+        return resp.choices[0].message.content or FALLBACK_REPLY
+    except OpenAIError as e:
+        logger.warning("OpenAI falló (%s): %s", type(e).__name__, e)
+        inc("llm.error")
+        return FALLBACK_REPLY
+
+async def stream_chatgpt(system_prompt: str, user_message: str | None = None) -> AsyncIterator[str]:
+    """Fragmentos de texto a medida que llegan; si falla antes del primero, emite FALLBACK_REPLY
+    (si falla después, relanza: la respuesta quedó incompleta)."""
+    if not OPENAI_API_KEY:
+        yield FALLBACK_REPLY
+        return
+    from openai import OpenAIError
+    sent = False
+    t0 = time.perf_counter()
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_API_KEY)
-        msgs = [{"role": "system", "content": system_prompt}]
-        if user_message:
-            msgs.append({"role": "user", "content": user_message})
-        resp = client.chat.completions.create(model=OPENAI_MODEL, messages=msgs, temperature=0.3)
-        return resp.choices[0].message.content
-    except Exception:
-        return "Aquí tienes algunas opciones recomendadas:"
+        stream = await _async_client().chat.completions.create(
+            model=OPENAI_MODEL, messages=_messages(system_prompt, user_message), temperature=0.3, stream=True
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if not sent:
+                    observe("llm.first_token", time.perf_counter() - t0)
+                sent = True
+                yield delta
+        observe("llm.stream", time.perf_counter() - t0)
+    except OpenAIError as e:
+        logger.warning("OpenAI (stream) falló (%s): %s", type(e).__name__, e)
+        inc("llm.error")
+        if sent:
+            raise
+    if not sent:
+        yield FALLBACK_REPLY
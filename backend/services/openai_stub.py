@@ -0,0 +1,52 @@
+# backend/services/openai_stub.py
+"""Stub local de /v1/chat/completions para probar el chat sin red ni API key real.
+
+    uvicorn backend.services.openai_stub:app --port 8099
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=stub uvicorn main:app
+
+Responde con un texto fijo tras OPENAI_STUB_LATENCY_MS (simula el round-trip del modelo);
+con "stream": true lo envía por SSE en fragmentos, como la API real.
+"""
+from __future__ import annotations
+import asyncio, json, os, time, uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_MS = float(os.getenv("OPENAI_STUB_LATENCY_MS", "400"))
+REPLY = os.getenv("OPENAI_STUB_REPLY", "Estas opciones cumplen lo que buscas; si me dices el espacio te ayudo a elegir.")
+
+app = FastAPI(title="OpenAI stub")
+
+def _chunk(cid: str, model: str, delta: dict, finish: str | None = None) -> str:
+    body = {
+        "id": cid, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+    }
+    return f"data: {json.dumps(body, ensure_ascii=False)}\n\n"
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    req = await request.json()
+    model = req.get("model") or "stub"
+    cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+    if not req.get("stream"):
+        await asyncio.sleep(LATENCY_MS / 1000)
+        return JSONResponse({
+            "id": cid, "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": REPLY}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    async def events():
+        words = REPLY.split(" ")
+        # primer token tras ~la mitad de la latencia, el resto repartido
+        await asyncio.sleep(LATENCY_MS / 2000)
+        yield _chunk(cid, model, {"role": "assistant", "content": ""})
+        for i, w in enumerate(words):
+            yield _chunk(cid, model, {"content": w if i == 0 else " " + w})
+            await asyncio.sleep(LATENCY_MS / 2000 / max(1, len(words)))
+        yield _chunk(cid, model, {}, "stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
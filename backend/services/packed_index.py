@@ -0,0 +1,487 @@
+# backend/services/packed_index.py
+"""Índice de búsqueda compacto: arrays planos + tablas de strings internadas.
+
+Todo vive en un único buffer (normalmente un mmap de solo lectura del snapshot,
+ver catalog_snapshot), así que los workers de uvicorn comparten las mismas páginas
+en lugar de tener cada uno sus dicts/sets:
+
+- términos del vocab en una tabla ordenada por bytes UTF-8 (term id = posición);
+- campos por producto (name, tags, ...) y posting lists término -> filas en CSR;
+- subcadenas y trigramas del vocab como tablas ordenadas + CSR a term ids;
+- specs numéricas por columna y cada registro como JSON (se decodifica al pedirlo);
+- opcionalmente, los k productos parecidos de cada fila (ver similar_index).
+
+Las búsquedas de strings son binarias sobre la tabla; no se crean dicts por proceso.
+`PackedDelta` superpone altas/bajas/cambios sobre un índice base sin reconstruirlo.
+"""
+from __future__ import annotations
+import json, sys
+from array import array
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+FIELDS = ("name", "tags", "cats", "slug", "code", "blob")
+FORMAT_NOTE = "ecolite-packed-v1"
+
+class StringTable:
+    """Strings UTF-8 concatenados + offsets. `order` permite búsqueda binaria en tablas no ordenadas."""
+
+    def __init__(self, offsets: memoryview, blob: memoryview, order: memoryview | None = None):
+        self.offsets = offsets
+        self.blob = blob
+        self.order = order
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def raw(self, i: int) -> bytes:
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+    def __getitem__(self, i: int) -> str:
+        return self.raw(i).decode("utf-8")
+
+    def find(self, s: str) -> Optional[int]:
+        key = s.encode("utf-8")
+        order = self.order
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.raw(order[mid] if order is not None else mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self):
+            i = order[lo] if order is not None else lo
+            if self.raw(i) == key:
+                return i
+        return None
+
+class PackedIndex:
+    """Vista de solo lectura sobre un buffer con el layout producido por `build`."""
+
+    def __init__(self, buf: memoryview, layout: Dict, owner: object = None):
+        if layout.get("byteorder") != sys.byteorder:
+            raise ValueError("índice empaquetado con otro byteorder")
+        self._owner = owner  # mantiene vivo el mmap
+        self.n = layout["count"]
+        self.n_docs = self.n  # productos vivos (en PackedDelta hay filas borradas)
+
+        def sec(name: str) -> memoryview:
+            off, size, tc = layout["sections"][name]
+            return buf[off:off + size].cast(tc)
+
+        def table(name: str, order: str | None = None) -> StringTable:
+            return StringTable(sec(name + "_off"), sec(name + "_blob"), sec(order) if order else None)
+
+        self.terms = table("terms")
+        self.n_terms = len(self.terms)
+        self.df = sec("df")
+        self.term_pos = sec("term_pos")
+        self.term_ngrams = sec("term_ngrams")
+        self.codes = table("codes", "codes_sorted")
+        self.fields = {f: (sec(f + "_ptr"), sec(f + "_idx")) for f in FIELDS}
+        self.post_ptr, self.post_rows = sec("post_ptr"), sec("post_rows")
+        self.subs = table("subs")
+        self.subs_ptr, self.subs_terms = sec("subs_ptr"), sec("subs_terms")
+        self.grams = table("grams")
+        self.grams_ptr, self.grams_terms = sec("grams_ptr"), sec("grams_terms")
+        self.spec_cols = {name[5:]: sec(name) for name in layout["sections"] if name.startswith("spec_")}
+        self.records = table("rec")
+        self.sim_k = layout.get("sim_k", 0)
+        self.sim_rows = sec("sim_rows") if self.sim_k else None
+        self.sim_scores = sec("sim_scores") if self.sim_k else None
+
+    def field(self, f: str, row: int) -> memoryview:
+        ptr, idx = self.fields[f]
+        return idx[ptr[row]:ptr[row + 1]]
+
+    def postings(self, tid: int) -> memoryview:
+        return self.post_rows[self.post_ptr[tid]:self.post_ptr[tid + 1]]
+
+    def substring_terms(self, s: str) -> memoryview:
+        i = self.subs.find(s)
+        if i is None:
+            return self.subs_terms[0:0]
+        return self.subs_terms[self.subs_ptr[i]:self.subs_ptr[i + 1]]
+
+    def gram_terms(self, g: str) -> memoryview:
+        i = self.grams.find(g)
+        if i is None:
+            return self.grams_terms[0:0]
+        return self.grams_terms[self.grams_ptr[i]:self.grams_ptr[i + 1]]
+
+    def record(self, row: int) -> dict:
+        return json.loads(self.records[row])
+
+    def is_live(self, row: int) -> bool:
+        return True
+
+class PackedRecords(Mapping):
+    """PRODUCTOS de solo lectura sobre el índice empaquetado (código -> registro, en orden de catálogo).
+
+    `generation` es la versión del catálogo; `stamp` identifica el archivo del que se abrió (None en memoria).
+    """
+
+    def __init__(self, packed: PackedIndex, generation: int = 0, stamp: Tuple[int, int] | None = None):
+        self.packed = packed
+        self.generation = generation
+        self.stamp = stamp
+
+    def __getitem__(self, code: str) -> dict:
+        row = self.packed.codes.find(code)
+        if row is None:
+            raise KeyError(code)
+        return self.packed.record(row)
+
+    def __iter__(self) -> Iterator[str]:
+        packed = self.packed
+        return (packed.codes[i] for i in range(packed.n) if packed.is_live(i))
+
+    def __len__(self) -> int:
+        return self.packed.n_docs
+
+# ----------------- Construcción -----------------
+class _Writer:
+    def __init__(self):
+        self.sections: Dict[str, List] = {}
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def add(self, name: str, arr: array):
+        pad = -self.size % 8
+        if pad:
+            self.chunks.append(b"\0" * pad)
+            self.size += pad
+        data = arr.tobytes()
+        self.sections[name] = [self.size, len(data), arr.typecode]
+        self.chunks.append(data)
+        self.size += len(data)
+
+    def table(self, name: str, strings: Iterable[str]):
+        offsets, blob = array("Q", [0]), bytearray()
+        for s in strings:
+            blob += s.encode("utf-8")
+            offsets.append(len(blob))
+        self.add(name + "_off", offsets)
+        self.add(name + "_blob", array("B", bytes(blob)))
+
+    def csr(self, name_ptr: str, name_idx: str, rows: Iterable[Iterable[int]]):
+        ptr, idx = array("I", [0]), array("I")
+        for r in rows:
+            idx.extend(sorted(r))
+            ptr.append(len(idx))
+        self.add(name_ptr, ptr)
+        self.add(name_idx, idx)
+
+def _sorted_by_bytes(strings: Iterable[str]) -> List[str]:
+    return sorted(strings, key=lambda s: s.encode("utf-8"))
+
+def build(
+    productos: Mapping[str, dict],
+    fields_fn: Callable[[dict], Dict[str, Set[str]]],
+    ngrams_fn: Callable[[str], Set[str]],
+    substrings_fn: Callable[[str], Set[str]],
+    spec_fields: Tuple[str, ...],
+    neighbors_fn: Callable[["PackedIndex"], Tuple[array, array, int]] | None = None,
+) -> Tuple[Dict, bytes]:
+    """Empaqueta `productos` -> (layout, bytes). Los offsets del layout son relativos al buffer.
+
+    `neighbors_fn` recibe el índice ya armado y devuelve (filas vecinas, scores, k) por fila."""
+    codes = list(productos)
+    row_fields: List[Dict[str, Set[str]]] = []
+    vocab: Dict[str, int] = {}  # término -> df, en orden de primera aparición
+    for code in codes:
+        f = fields_fn(productos[code])
+        row_fields.append(f)
+        # orden estable dentro del producto: el snapshot no depende del hash seed del proceso
+        for t in sorted(set().union(*f.values())):
+            vocab[t] = vocab.get(t, 0) + 1
+
+    terms = _sorted_by_bytes(vocab)
+    tid = {t: i for i, t in enumerate(terms)}
+    first_seen = {t: i for i, t in enumerate(vocab)}
+
+    w = _Writer()
+    w.table("terms", terms)
+    w.add("df", array("I", (vocab[t] for t in terms)))
+    w.add("term_pos", array("I", (first_seen[t] for t in terms)))
+    w.add("term_ngrams", array("I", (len(ngrams_fn(t)) for t in terms)))
+
+    w.table("codes", codes)
+    w.add("codes_sorted", array("I", sorted(range(len(codes)), key=lambda i: codes[i].encode("utf-8"))))
+
+    for f in FIELDS:
+        w.csr(f + "_ptr", f + "_idx", ({tid[t] for t in rf[f]} for rf in row_fields))
+
+    postings: List[List[int]] = [[] for _ in terms]
+    for row, rf in enumerate(row_fields):
+        for t in set().union(*rf.values()):
+            postings[tid[t]].append(row)
+    w.csr("post_ptr", "post_rows", postings)
+
+    subs: Dict[str, Set[int]] = {}
+    grams: Dict[str, Set[int]] = {}
+    for t in terms:
+        for s in substrings_fn(t):
+            subs.setdefault(s, set()).add(tid[t])
+        for g in ngrams_fn(t):
+            grams.setdefault(g, set()).add(tid[t])
+    subs_keys, grams_keys = _sorted_by_bytes(subs), _sorted_by_bytes(grams)
+    w.table("subs", subs_keys)
+    w.csr("subs_ptr", "subs_terms", (subs[s] for s in subs_keys))
+    w.table("grams", grams_keys)
+    w.csr("grams_ptr", "grams_terms", (grams[g] for g in grams_keys))
+
+    for name in spec_fields:
+        col = array("d")
+        for code in codes:
+            v = (productos[code].get("specs_num") or {}).get(name)
+            col.append(float("nan") if v is None else float(v))
+        w.add("spec_" + name, col)
+
+    w.table("rec", (json.dumps(productos[c], ensure_ascii=False) for c in codes))
+
+    layout = {"note": FORMAT_NOTE, "byteorder": sys.byteorder, "count": len(codes), "sections": w.sections}
+    if neighbors_fn is not None:
+        # sobre la vista del índice ya escrito: mismos term ids, df y specs que usa la búsqueda
+        rows, scores, k = neighbors_fn(PackedIndex(memoryview(b"".join(w.chunks)), layout))
+        if k:
+            w.add("sim_rows", rows)
+            w.add("sim_scores", scores)
+            layout["sim_k"] = k
+    return layout, b"".join(w.chunks)
+
+# ----------------- Cambios incrementales -----------------
+class _DeltaTerms:
+    """Términos base + nuevos (ids desde len(base)); `find` ignora los que quedaron con df 0."""
+
+    def __init__(self, delta: "PackedDelta"):
+        self.d = delta
+
+    def __len__(self) -> int:
+        return self.d.n_terms
+
+    def __getitem__(self, i: int) -> str:
+        nb = self.d.base.n_terms
+        return self.d.base.terms[i] if i < nb else self.d.new_terms[i - nb]
+
+    def find(self, s: str) -> Optional[int]:
+        i = self.d._tid(s)
+        return i if i is not None and self.d.df[i] > 0 else None
+
+class _DeltaDf:
+    def __init__(self, delta: "PackedDelta"):
+        self.d = delta
+
+    def __getitem__(self, i: int) -> int:
+        base = self.d.base
+        return (base.df[i] if i < base.n_terms else 0) + self.d.df_delta.get(i, 0)
+
+class _DeltaCodes:
+    def __init__(self, delta: "PackedDelta"):
+        self.d = delta
+
+    def __len__(self) -> int:
+        return self.d.n
+
+    def __getitem__(self, row: int) -> str:
+        base = self.d.base
+        return base.codes[row] if row < base.n else self.d.new_codes[row - base.n]
+
+    def find(self, code: str) -> Optional[int]:
+        row = self.d.new_rows.get(code)
+        if row is not None:
+            return row
+        row = self.d.base.codes.find(code)
+        return None if row is None or row in self.d.dead else row
+
+class PackedDelta:
+    """Índice base (inmutable) + altas/bajas/cambios, con la misma interfaz de lectura que PackedIndex.
+
+    Las filas modificadas conservan su posición (como al reescribir la clave en el JSON); las altas
+    van al final y una baja deja la fila muerta. `apply` devuelve un delta nuevo (copy-on-write), así
+    que un snapshot publicado nunca cambia. Lo pendiente se compacta reconstruyendo el índice base.
+    """
+
+    def __init__(
+        self,
+        base: PackedIndex,
+        fields_fn: Callable[[dict], Dict[str, Set[str]]],
+        ngrams_fn: Callable[[str], Set[str]],
+        substrings_fn: Callable[[str], Set[str]],
+    ):
+        self.base = base
+        self._fns = (fields_fn, ngrams_fn, substrings_fn)
+        self.n = base.n
+        self.n_docs = base.n_docs
+        self.new_terms: List[str] = []
+        self.new_term_ids: Dict[str, int] = {}
+        self.df_delta: Dict[int, int] = {}
+        self.new_codes: List[str] = []
+        self.new_rows: Dict[str, int] = {}
+        self.rows: Dict[int, Tuple[str, Dict[str, array]]] = {}  # fila -> (registro JSON, campos en term ids)
+        self.dead: Set[int] = set()
+        self.extra_post: Dict[int, Set[int]] = {}  # term id -> filas de `rows` que lo contienen
+        self.extra_subs: Dict[str, List[int]] = {}
+        self.extra_grams: Dict[str, List[int]] = {}
+        self.spec_cols: Dict[str, array] = {k: array("d", v) for k, v in base.spec_cols.items()}
+        self._views()
+        self._fields_csr: Dict[str, Tuple[array, array]] | None = None
+
+    @property
+    def n_terms(self) -> int:
+        return self.base.n_terms + len(self.new_terms)
+
+    def _views(self):
+        self.terms, self.df, self.codes = _DeltaTerms(self), _DeltaDf(self), _DeltaCodes(self)
+        self.term_pos, self.term_ngrams = _TermPos(self), _TermNgrams(self)
+
+    def _copy(self) -> "PackedDelta":
+        out = PackedDelta.__new__(PackedDelta)
+        out.__dict__.update(self.__dict__)
+        out.new_terms = list(self.new_terms)
+        out.new_term_ids = dict(self.new_term_ids)
+        out.df_delta = dict(self.df_delta)
+        out.new_codes = list(self.new_codes)
+        out.new_rows = dict(self.new_rows)
+        out.rows = dict(self.rows)
+        out.dead = set(self.dead)
+        out.extra_post = {t: set(r) for t, r in self.extra_post.items()}
+        out.extra_subs = {s: list(t) for s, t in self.extra_subs.items()}
+        out.extra_grams = {g: list(t) for g, t in self.extra_grams.items()}
+        out.spec_cols = {k: array("d", v) for k, v in self.spec_cols.items()}
+        out._views()
+        out._fields_csr = None
+        return out
+
+    # ---- lectura (misma interfaz que PackedIndex) ----
+    def _tid(self, s: str) -> Optional[int]:
+        i = self.base.terms.find(s)
+        return i if i is not None else self.new_term_ids.get(s)
+
+    def field(self, f: str, row: int) -> Sequence[int]:
+        if row in self.rows:
+            return self.rows[row][1][f]
+        if row in self.dead or row >= self.base.n:
+            return ()
+        return self.base.field(f, row)
+
+    def postings(self, tid: int) -> List[int]:
+        touched = self.rows.keys() | self.dead
+        out = [r for r in self.base.postings(tid) if r not in touched] if tid < self.base.n_terms else []
+        out.extend(self.extra_post.get(tid, ()))
+        return out
+
+    def substring_terms(self, s: str) -> List[int]:
+        return list(self.base.substring_terms(s)) + self.extra_subs.get(s, [])
+
+    def gram_terms(self, g: str) -> List[int]:
+        df = self.df
+        return [t for t in list(self.base.gram_terms(g)) + self.extra_grams.get(g, []) if df[t] > 0]
+
+    def record(self, row: int) -> dict:
+        if row in self.rows:
+            return json.loads(self.rows[row][0])
+        return self.base.record(row)
+
+    def is_live(self, row: int) -> bool:
+        return row not in self.dead
+
+    @property
+    def fields(self) -> Dict[str, Tuple[array, array]]:
+        """CSR por campo sobre todas las filas (para el motor disperso); se arma al pedirlo."""
+        if self._fields_csr is None:
+            csr = {}
+            for f in FIELDS:
+                ptr, idx = array("I", [0]), array("I")
+                for row in range(self.n):
+                    idx.extend(self.field(f, row))
+                    ptr.append(len(idx))
+                csr[f] = (ptr, idx)
+            self._fields_csr = csr
+        return self._fields_csr
+
+    # ---- escritura ----
+    def apply(self, upserts: Mapping[str, dict], deletes: Iterable[str]) -> "PackedDelta":
+        """Delta nuevo con `deletes` aplicados y luego `upserts` (registros ya normalizados)."""
+        out = self._copy()
+        for code in deletes:
+            row = out.codes.find(code)
+            if row is not None:
+                out._drop(row)
+                out.dead.add(row)
+                out.new_rows.pop(code, None)
+                out.n_docs -= 1
+        for code, rec in upserts.items():
+            row = out.codes.find(code)
+            if row is None:
+                row = out.n
+                out.n += 1
+                out.n_docs += 1
+                out.new_codes.append(code)
+                out.new_rows[code] = row
+                for col in out.spec_cols.values():
+                    col.append(float("nan"))
+            else:
+                out._drop(row)
+            out._put(row, rec)
+        return out
+
+    def _drop(self, row: int):
+        """Descuenta los términos de la fila (df y postings extra)."""
+        terms = set()
+        for f in FIELDS:
+            terms.update(self.field(f, row))
+        for t in terms:
+            self.df_delta[t] = self.df_delta.get(t, 0) - 1
+            if row in self.extra_post.get(t, ()):
+                self.extra_post[t].discard(row)
+        self.rows.pop(row, None)
+
+    def _put(self, row: int, rec: dict):
+        fields_fn, ngrams_fn, substrings_fn = self._fns
+        ids: Dict[str, array] = {}
+        for f, toks in fields_fn(rec).items():
+            ids[f] = array("I", sorted(self._add_term(t) for t in toks))
+        for t in set().union(*ids.values()):
+            self.df_delta[t] = self.df_delta.get(t, 0) + 1
+            self.extra_post.setdefault(t, set()).add(row)
+        self.rows[row] = (json.dumps(rec, ensure_ascii=False), ids)
+        specs = rec.get("specs_num") or {}
+        for name, col in self.spec_cols.items():
+            v = specs.get(name)
+            col[row] = float("nan") if v is None else float(v)
+
+    def _add_term(self, t: str) -> int:
+        i = self._tid(t)
+        if i is not None:
+            return i
+        i = self.n_terms
+        self.new_terms.append(t)
+        self.new_term_ids[t] = i
+        _, ngrams_fn, substrings_fn = self._fns
+        for s in substrings_fn(t):
+            self.extra_subs.setdefault(s, []).append(i)
+        for g in ngrams_fn(t):
+            self.extra_grams.setdefault(g, []).append(i)
+        return i
+
+class _TermPos:
+    """Orden de aparición: los términos nuevos van detrás de todo el vocab base."""
+
+    def __init__(self, delta: PackedDelta):
+        self.d = delta
+
+    def __getitem__(self, i: int) -> int:
+        base = self.d.base
+        return base.term_pos[i] if i < base.n_terms else i
+
+class _TermNgrams:
+    def __init__(self, delta: PackedDelta):
+        self.d = delta
+
+    def __getitem__(self, i: int) -> int:
+        base = self.d.base
+        if i < base.n_terms:
+            return base.term_ngrams[i]
+        return len(self.d._fns[1](self.d.terms[i]))
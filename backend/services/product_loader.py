@@ -1,11 +1,17 @@
 # backend/services/product_loader.py
 from __future__ import annotations
-import os, json, unicodedata, re
+import os, json, re
 from pathlib import Path
 from typing import Dict, Tuple, List
+from backend.services.specs import parse_specs
+from backend.services import catalog_snapshot
+from backend.services.metrics import timed_fn
+from backend.services.text_analysis import norm_txt, tokens
 
 # 1) Variable de entorno (recomendada)
 ENV_PATH = os.getenv("ECOLITE_PRODUCTS_PATH")
+# Fichas técnicas unidas por código (ver datasheet_ingest); por defecto junto al catálogo
+DATASHEETS_ENV_PATH = os.getenv("ECOLITE_DATASHEETS_PATH")
 
 # 2) Fallbacks conocidos
 DEFAULT_PATHS = [
@@ -16,30 +22,14 @@ DEFAULT_PATHS = [
 DATA_PATH: Path | None = None
 PRODUCTOS: Dict[str, dict] = {}
 
-# ----------------- Normalización -----------------
-def _strip_accents(s: str) -> str:
-    return "".join(c for c in unicodedata.normalize("NFD", s or "") if unicodedata.category(c) != "Mn")
-
-def norm_txt(s: str) -> str:
-    s = _strip_accents((s or "").lower())
-    s = re.sub(r"[\s_]+", " ", s).strip()
-    return s
-
-def tok(s: str) -> List[str]:
-    s = norm_txt(s)
-    # separa 3000k/ip65/12v con seguridad
-    s = re.sub(r"([0-9]+)([a-z]+)", r"\1 \2", s)
-    s = re.sub(r"([a-z]+)([0-9]+)", r"\1 \2", s)
-    parts = re.split(r"[^a-z0-9]+", s)
-    return [p for p in parts if p and len(p) >= 2]
-
+# ----------------- Normalización (ver text_analysis) -----------------
 def url_slug_tokens(url: str | None) -> List[str]:
     if not url:
         return []
     path = re.sub(r"^https?://[^/]+", "", url or "")
     toks: List[str] = []
     for seg in [seg for seg in path.split("/") if seg]:
-        toks.extend(tok(seg.replace("-", " ")))
+        toks.extend(tokens(seg.replace("-", " ")))
     return toks
 
 # ----------------- Carga catálogo -----------------
@@ -87,26 +77,71 @@ def _postprocess_record(rec: dict) -> dict:
     rec["tags_norm"] = tags_norm
     rec["slug_toks"] = slug_toks
     rec["search_blob"] = " ".join([p for p in blob_parts if p]).strip()
+    # specs numéricas (vatios, CCT, IP, voltaje, precio) para filtros de búsqueda
+    rec["specs_num"] = parse_specs(" ".join([name_norm, *tags_norm]), rec.get("price"), rec.get("specs"))
     return rec
 
-def _load_from_disk() -> Dict[str, dict]:
-    path = _resolve_path()
+def datasheets_path(path: Path) -> Path:
+    return Path(DATASHEETS_ENV_PATH) if DATASHEETS_ENV_PATH else path.parent / "datasheets.json"
+
+# campos que agrega _postprocess_record (se recalculan siempre a partir del resto)
+_DERIVED = ("name_norm", "code_norm", "categories_norm", "tags_norm", "slug_toks", "search_blob", "specs_num")
+
+def raw_record(rec: dict) -> dict:
+    """Registro normalizado -> campos de origen (para aplicar un parche y volver a normalizar)."""
+    return {k: v for k, v in rec.items() if k not in _DERIVED}
+
+def prepare_record(code: str, rec: dict, sheets: Dict[str, dict]) -> dict:
+    """Registro crudo del catálogo -> registro normalizado (con la ficha técnica fusionada)."""
+    rec = {**rec}
+    rec.setdefault("code", code)
+    if code in sheets:
+        # los specs explícitos del catálogo mandan sobre los de la ficha
+        rec["specs"] = {**sheets[code], **(rec.get("specs") or {})}
+    return _postprocess_record(rec)
+
+_SHEETS: Dict[tuple, Dict[str, dict]] = {}
+
+def load_datasheets(path: Path) -> Dict[str, dict]:
+    """Fichas técnicas por código (de solo lectura: se reusan mientras el archivo no cambie)."""
+    ds_path = datasheets_path(path)
+    try:
+        st = ds_path.stat()
+    except FileNotFoundError:
+        return {}
+    key = (str(ds_path), st.st_mtime_ns, st.st_size)
+    sheets = _SHEETS.get(key)
+    if sheets is None:
+        with open(ds_path, "r", encoding="utf-8") as f:
+            sheets = json.load(f)
+        _SHEETS.clear()
+        _SHEETS[key] = sheets
+    return sheets
+
+def read_catalog(path: Path) -> Dict[str, dict]:
+    """JSON crudo del catálogo como {CODE: registro}."""
     with open(path, "r", encoding="utf-8") as f:
         raw = json.load(f)
-
     # admite dict {CODE:{...}} o lista [{...}]
     if isinstance(raw, list):
-        data = {str(it.get("code") or it.get("sku") or f"ITEM{i}"): it for i, it in enumerate(raw)}
-    else:
-        data = dict(raw)
+        return {str(it.get("code") or it.get("sku") or f"ITEM{i}"): it for i, it in enumerate(raw)}
+    return dict(raw)
+
+@timed_fn("catalog.load")
+def _load_from_disk(use_snapshot: bool = True) -> Dict[str, dict]:
+    path = _resolve_path()
+    if use_snapshot:
+        cached = catalog_snapshot.load_records(path)
+        if cached is not None:
+            return cached
+    data = read_catalog(path)
+    sheets = load_datasheets(path)
 
     out: Dict[str, dict] = {}
     for code, rec in data.items():
         if not isinstance(rec, dict):
             continue
-        rec = {**rec}
-        rec.setdefault("code", code)
-        out[code] = _postprocess_record(rec)
+        out[code] = prepare_record(code, rec, sheets)
 
     if not out:
         raise RuntimeError("El catálogo cargó vacío.")
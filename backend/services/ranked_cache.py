@@ -0,0 +1,54 @@
+# backend/services/ranked_cache.py
+"""Caché de listas rankeadas para paginar ("ver más") sin re-rankear.
+
+Clave = (consulta, semilla del jitter, versión del catálogo): con eso el ranking es
+determinista. Valor = filas del índice en orden de ranking (array compacto), hasta
+RANKED_MAX_ROWS, y si la lista está completa. Las filas solo valen para esa versión del
+catálogo, por eso la versión va en la clave.
+
+Por proceso, LRU + TTL: ECOLITE_RANKED_CACHE_MAX entradas, ECOLITE_RANKED_CACHE_TTL_S.
+"""
+from __future__ import annotations
+import os, threading, time
+from array import array
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+RANKED_CACHE_MAX = int(os.getenv("ECOLITE_RANKED_CACHE_MAX", "1000"))
+RANKED_CACHE_TTL_S = float(os.getenv("ECOLITE_RANKED_CACHE_TTL_S", "600"))
+# filas guardadas por consulta (~100 páginas de 5); más allá se rankea de nuevo
+RANKED_MAX_ROWS = int(os.getenv("ECOLITE_RANKED_MAX_ROWS", "500"))
+
+Ranked = Tuple[array, bool]  # (filas en orden, ¿completa?)
+
+class RankedCache:
+    def __init__(self, max_items: int, ttl_s: float):
+        self.max_items, self.ttl_s = max_items, ttl_s
+        self._data: "OrderedDict[Hashable, Tuple[float, Ranked]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Ranked]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.time():
+                self._data.pop(key, None)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, ranked: Ranked):
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl_s, ranked)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+RANKED = RankedCache(RANKED_CACHE_MAX, RANKED_CACHE_TTL_S)
@@ -0,0 +1,124 @@
+# backend/services/reply_cache.py
+"""Caché de respuestas del LLM.
+
+Clave = hash de (consulta normalizada, página, códigos candidatos en orden, versión del
+prompt, modelo): con eso `build_prompt` produce el mismo prompt. Cada entrada guarda la
+versión del catálogo con la que se generó y solo se sirve para esa misma versión; al
+publicarse una versión nueva las anteriores se descartan.
+
+ECOLITE_REPLY_CACHE = memory (por proceso, por defecto) | sqlite (archivo compartido entre
+workers, ECOLITE_REPLY_CACHE_PATH) | off. TTL y tamaño máximo (LRU) configurables.
+"""
+from __future__ import annotations
+import hashlib, json, os, sqlite3, threading, time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from backend.services.context_builder import PROMPT_VERSION
+from backend.services.openai_client import OPENAI_MODEL
+from backend.services.text_analysis import norm_txt
+
+REPLY_CACHE = os.getenv("ECOLITE_REPLY_CACHE", "memory").strip().lower()
+REPLY_CACHE_PATH = Path(os.getenv("ECOLITE_REPLY_CACHE_PATH") or Path(__file__).parent.parent / "data" / "reply_cache.sqlite3")
+REPLY_CACHE_TTL_S = float(os.getenv("ECOLITE_REPLY_CACHE_TTL_S", "86400"))
+REPLY_CACHE_MAX = int(os.getenv("ECOLITE_REPLY_CACHE_MAX", "5000"))
+
+def reply_key(query: str, page: int, codes: List[str]) -> str:
+    raw = json.dumps([norm_txt(query), page, codes, PROMPT_VERSION, OPENAI_MODEL], ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+class MemoryCache:
+    """LRU + TTL en memoria del proceso."""
+
+    def __init__(self, max_items: int, ttl_s: float):
+        self.max_items, self.ttl_s = max_items, ttl_s
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key: str, version: int) -> Optional[str]:
+        with self._lock:
+            if version != self._version:
+                self._reset(version)
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.time():
+                self._data.pop(key, None)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, version: int, reply: str):
+        with self._lock:
+            if version != self._version:
+                self._reset(version)
+            self._data[key] = (time.time() + self.ttl_s, reply)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def _reset(self, version: int):
+        # solo se avanza: un request rezagado con la versión anterior no vacía la caché nueva
+        if self._version is None or version > self._version:
+            self._data.clear()
+            self._version = version
+
+class SqliteCache:
+    """Misma semántica sobre SQLite (WAL), compartida por los workers de la máquina."""
+
+    def __init__(self, path: Path, max_items: int, ttl_s: float):
+        self.path, self.max_items, self.ttl_s = path, max_items, ttl_s
+        self._local = threading.local()
+        self._purged_below = 0
+        self.hits = self.misses = 0
+        with self._conn() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS replies (
+                key TEXT PRIMARY KEY, version INTEGER NOT NULL, reply TEXT NOT NULL,
+                expires REAL NOT NULL, used REAL NOT NULL)""")
+            db.execute("CREATE INDEX IF NOT EXISTS replies_used ON replies(used)")
+
+    def _conn(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get(self, key: str, version: int) -> Optional[str]:
+        db, now = self._conn(), time.time()
+        row = db.execute("SELECT reply FROM replies WHERE key=? AND version=? AND expires>?", (key, version, now)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        db.execute("UPDATE replies SET used=? WHERE key=?", (now, key))
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, version: int, reply: str):
+        db, now = self._conn(), time.time()
+        db.execute("INSERT OR REPLACE INTO replies VALUES (?, ?, ?, ?, ?)", (key, version, reply, now + self.ttl_s, now))
+        if version > self._purged_below:
+            self._purged_below = version
+            db.execute("DELETE FROM replies WHERE version<? OR expires<?", (version, now))
+        extra = db.execute("SELECT COUNT(*) FROM replies").fetchone()[0] - self.max_items
+        if extra > 0:
+            db.execute("DELETE FROM replies WHERE key IN (SELECT key FROM replies ORDER BY used LIMIT ?)", (extra,))
+
+_CACHE = None
+_CACHE_READY = False
+
+def get_cache():
+    """Caché configurada (None si ECOLITE_REPLY_CACHE=off)."""
+    global _CACHE, _CACHE_READY
+    if not _CACHE_READY:
+        if REPLY_CACHE == "sqlite":
+            _CACHE = SqliteCache(REPLY_CACHE_PATH, REPLY_CACHE_MAX, REPLY_CACHE_TTL_S)
+        elif REPLY_CACHE != "off":
+            _CACHE = MemoryCache(REPLY_CACHE_MAX, REPLY_CACHE_TTL_S)
+        _CACHE_READY = True
+    return _CACHE
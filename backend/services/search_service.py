@@ -1,24 +1,27 @@
 # backend/services/search_service.py
 from __future__ import annotations
-import re, unicodedata, random, math
-from typing import List, Dict, Tuple, Set
-from backend.services.product_loader import load_products, PRODUCTOS
-
-def _strip_accents(s: str) -> str:
-    return "".join(c for c in unicodedata.normalize("NFD", s or "") if unicodedata.category(c) != "Mn")
-
-def _norm(s: str) -> str:
-    s = _strip_accents((s or "").lower())
-    s = re.sub(r"[^\w\s\-]+", " ", s)
-    s = re.sub(r"[\s_]+", " ", s).strip()
-    return s
-
-def _tok(s: str) -> List[str]:
-    s = _norm(s)
-    s = re.sub(r"([0-9]+)([a-z]+)", r"\1 \2", s)
-    s = re.sub(r"([a-z]+)([0-9]+)", r"\1 \2", s)
-    toks = re.split(r"[^a-z0-9]+", s)
-    return [t for t in toks if t and len(t) >= 2]
+import os, random, math, heapq, logging, threading, time
+from array import array
+from pathlib import Path
+from typing import Any, Callable, List, Dict, Tuple, Set, Iterable, Mapping, NamedTuple, Optional
+from backend.services.product_loader import load_datasheets, load_products, reload_products, _resolve_path, raw_record
+from backend.services import catalog_changes, catalog_snapshot, packed_index, similar_index
+from backend.services.metrics import inc, timed
+from backend.services.packed_index import PackedDelta, PackedIndex, PackedRecords
+from backend.services.ranked_cache import RANKED, RANKED_MAX_ROWS
+from backend.services.similar_index import SimilarIndex
+from backend.services.sku_index import SkuIndex, norm_code
+from backend.services.spell_index import SpellIndex
+from backend.services.suggest_index import SuggestIndex
+from backend.services.text_analysis import index_tokens, intern_term, norm_txt, query_tokens, tokens
+from backend.services.specs import SPEC_FIELDS, SpecTable, parse_query_filters
+
+logger = logging.getLogger("uvicorn.error")
+
+# "python" (por defecto) o "sparse" (NumPy/SciPy, ver sparse_engine)
+SEARCH_ENGINE = os.getenv("ECOLITE_SEARCH_ENGINE", "python").strip().lower()
+# cada cuánto (s) se mira si otro worker publicó un snapshot nuevo en disco
+SNAPSHOT_CHECK_S = float(os.getenv("ECOLITE_SNAPSHOT_CHECK_S", "1"))
 
 _STOPWORDS_ES: Set[str] = {
     "de","del","la","el","los","las","un","una","unos","unas","y","o","u","a","en",
@@ -28,64 +31,331 @@ _STOPWORDS_ES: Set[str] = {
     "hola","buenas","buenos","dias","días","tardes","noches","quiero","necesito"
 }
 
-_INDEX_READY = False
-_INDEX: Dict[str, Dict[str, Set[str]]] = {}
-_VOCAB: Dict[str, int] = {}
-_IDF: Dict[str, float] = {}
+class IndexSnapshot(NamedTuple):
+    """Catálogo + índice inmutables. Se publican con un único swap de `_CURRENT`:
+    una búsqueda toma la referencia al empezar y la usa hasta el final."""
+    version: int
+    productos: Mapping[str, dict]
+    packed: PackedIndex  # normalmente mmap del snapshot, compartido entre workers; filas = orden de catálogo
+    specs: SpecTable     # columnas de specs en orden de catálogo
+    engine: Any          # SparseEngine si SEARCH_ENGINE == "sparse"
+    skus: SkuIndex       # códigos exactos / por prefijo (atajo antes del ranker)
+    suggest: SuggestIndex  # autocompletado (/search/suggest)
+    spell: SpellIndex    # corrección de typos (SymSpell) antes del scoring
+    similar: SimilarIndex  # productos parecidos (precalculados en el snapshot)
+    path: Path
+    stamp: Optional[Tuple[int, int]]  # archivo de snapshot del que salió (ver catalog_snapshot)
+    base: int            # generación en disco sobre la que aplican los lotes del log de cambios
+    log: catalog_changes.LogPos = None  # hasta dónde se aplicó el log
+    pending: int = 0     # lotes aplicados sobre el índice base (sin compactar)
+
+_CURRENT: IndexSnapshot | None = None
+_LOCK = threading.Lock()  # serializa construcciones/recargas; las búsquedas nunca lo esperan
+_NEXT_CHECK = 0.0
+_SEEN_STAMP: Optional[Tuple[int, int]] = None
+_COMPACTING = threading.Event()
+
+def _index_fields(p: dict) -> Dict[str, Set[str]]:
+    # los campos *_norm ya vienen normalizados (product_loader): solo se cortan en tokens
+    name_n, tags_n, cats_n = p.get("name_norm"), p.get("tags_norm"), p.get("categories_norm")
+    name = set(index_tokens(name_n)) if name_n else set(tokens(p.get("name") or ""))
+    tags = set(index_tokens(" ".join(tags_n))) if tags_n else set(tokens(" ".join(p.get("tags") or [])))
+    cats = set(index_tokens(" ".join(cats_n))) if cats_n else set(tokens(" ".join(p.get("categories") or [])))
+    slug = {intern_term(t) for t in p.get("slug_toks") or []}
+    codef = set(index_tokens(p.get("code_norm") or norm_txt(p.get("code") or "")))
+    blob = set(index_tokens(p.get("search_blob") or "")) | slug | codef
+    for field, normed in ((name, name_n), (tags, tags_n), (cats, cats_n)):
+        if normed:
+            blob |= field
+    return {"name": name, "tags": tags, "cats": cats, "slug": slug, "code": codef, "blob": blob}
+
+def _build_index(productos: Mapping[str, dict]) -> Tuple[Dict, bytes]:
+    """Empaqueta el índice de `productos` -> (layout, bytes); ver packed_index."""
+    return packed_index.build(productos, _index_fields, _ngrams, _substrings, SPEC_FIELDS, _neighbors)
+
+def _neighbors(packed: PackedIndex):
+    with timed("index.similar"):
+        return similar_index.build(packed)
+
+def _build_snapshot(productos: Mapping[str, dict], path: Path, prev: IndexSnapshot | None,
+                    generation: int | None = None) -> IndexSnapshot:
+    """Arma un IndexSnapshot nuevo sin tocar el publicado (con los lotes pendientes del log aplicados)."""
+    # el snapshot de disco trae el índice ya empaquetado para este mismo catálogo
+    recs = productos if isinstance(productos, PackedRecords) else None
+    if recs is None:
+        with timed("index.build"):
+            layout, body = _build_index(productos)
+        recs = catalog_snapshot.save(path, layout, body, generation) or \
+            catalog_snapshot.in_memory(layout, body, generation or (prev.version if prev else 0) + 1)
+    packed = recs.packed
+    snap = IndexSnapshot(
+        version=recs.generation,
+        productos=recs,
+        packed=packed,
+        specs=SpecTable.from_columns(packed.n, packed.spec_cols),
+        engine=_build_engine(packed),
+        skus=SkuIndex(packed),
+        suggest=SuggestIndex(packed),
+        spell=SpellIndex(packed),
+        similar=SimilarIndex(packed),
+        path=path,
+        stamp=recs.stamp,
+        base=recs.generation if recs.stamp is not None else catalog_snapshot.disk_generation(path),
+    )
+    return _replay(snap)
+
+class _Lazy:
+    """Índice derivado que se arma la primera vez que se usa: tras cada lote del log no se
+    reconstruyen SKUs/autocompletado/typos si nadie los consulta antes del siguiente."""
+    __slots__ = ("_build", "_obj", "_lock")
+
+    def __init__(self, build: Callable[[], Any]):
+        self._build, self._obj, self._lock = build, None, threading.Lock()
+
+    def __getattr__(self, name: str):
+        obj = self._obj
+        if obj is None:
+            with self._lock:
+                if self._obj is None:
+                    self._obj = self._build()
+                obj = self._obj
+        return getattr(obj, name)
+
+# campos normalizados de los que salen términos, SKUs y sugerencias (no el precio ni las specs)
+_TEXT_FIELDS = ("code_norm", "name", "name_norm", "categories_norm", "tags_norm", "slug_toks", "search_blob")
+
+def _same_text(productos: Mapping[str, dict], upserts: Mapping[str, dict], deletes: List[str]) -> bool:
+    """¿El lote deja igual todo lo indexado? (p. ej. solo cambia precio o specs)"""
+    if deletes:
+        return False
+    for code, rec in upserts.items():
+        old = productos.get(code)
+        if old is None or any(old.get(f) != rec.get(f) for f in _TEXT_FIELDS):
+            return False
+    return True
+
+def _replay(snap: IndexSnapshot) -> IndexSnapshot:
+    """Aplica sobre `snap` los lotes nuevos del log de cambios (solo los de su misma base).
 
-def reset_index():
-    """Permite reconstruir el índice tras reload del catálogo."""
-    global _INDEX_READY, _INDEX, _VOCAB, _IDF
-    _INDEX_READY = False
-    _INDEX.clear(); _VOCAB.clear(); _IDF.clear()
+    Si ningún lote cambia texto indexado (cambios de precio/specs del ERP) se conservan el
+    motor, los SKUs, el autocompletado y los typos del snapshot anterior: solo cambian los
+    registros y las columnas de specs. Si no, esos índices se rearman al usarlos (`_Lazy`)."""
+    batches, pos = catalog_changes.read(snap.path, snap.log)
+    batches = [b for b in batches if b.get("base") == snap.base]
+    if not batches:
+        return snap if pos == snap.log else snap._replace(log=pos)
+    packed = snap.packed
+    if not isinstance(packed, PackedDelta):
+        packed = PackedDelta(packed, _index_fields, _ngrams, _substrings)
+    productos, sheets = snap.productos, load_datasheets(snap.path)
+    same_text = True
+    with timed("index.replay"):
+        for b in batches:
+            try:
+                upserts, deletes = catalog_changes.batch_records(productos, b, sheets)
+            except Exception:
+                # un lote que no se puede aplicar no tumba la búsqueda: se saltea (y la compactación lo descarta)
+                logger.exception("Lote del log de cambios inválido (base %s); se saltea.", b.get("base"))
+                continue
+            same_text = same_text and _same_text(productos, upserts, deletes)
+            packed = packed.apply(upserts, deletes)
+            productos = PackedRecords(packed)
+    version = snap.version + len(batches)
+    if same_text:
+        inc("index.replay_specs_only")
+        derived = dict(engine=snap.engine, skus=snap.skus, suggest=snap.suggest, spell=snap.spell)
+    else:
+        derived = dict(engine=_Lazy(lambda: _build_engine(packed)) if snap.engine is not None else None,
+                       skus=_Lazy(lambda: SkuIndex(packed)), suggest=_Lazy(lambda: SuggestIndex(packed)),
+                       spell=_Lazy(lambda: SpellIndex(packed)))
+    return snap._replace(
+        version=version,
+        productos=PackedRecords(packed, version, snap.stamp),
+        packed=packed,
+        specs=SpecTable.from_columns(packed.n, packed.spec_cols),
+        similar=SimilarIndex(packed),
+        log=pos,
+        pending=snap.pending + len(batches),
+        **derived,
+    )
 
-def _ensure_index():
-    global _INDEX_READY, _INDEX, _VOCAB, _IDF, PRODUCTOS
-    if _INDEX_READY:
+def _publish(snap: IndexSnapshot) -> IndexSnapshot:
+    global _CURRENT, _SEEN_STAMP
+    if _CURRENT is None or snap.version != _CURRENT.version:
+        logger.info("Catálogo v%d publicado (%d productos).", snap.version, snap.packed.n_docs)
+    if snap.stamp is not None:
+        _SEEN_STAMP = snap.stamp
+    _CURRENT = snap  # swap atómico: las búsquedas en curso conservan el anterior
+    return snap
+
+def _sync(snap: IndexSnapshot) -> IndexSnapshot:
+    """Pone `snap` al día con el disco (snapshot reescrito por otro worker, lotes nuevos del log). Con _LOCK."""
+    global _SEEN_STAMP
+    stamp = catalog_snapshot.snapshot_stamp(snap.path)
+    if stamp is not None and stamp != _SEEN_STAMP:
+        _SEEN_STAMP = stamp
+        recs = catalog_snapshot.load_records(snap.path)
+        if recs is not None and recs.stamp != snap.stamp:
+            snap = _build_snapshot(recs, snap.path, snap)
+    snap = _replay(snap)
+    return snap if snap is _CURRENT else _publish(snap)
+
+def _maybe_refresh(snap: IndexSnapshot) -> IndexSnapshot:
+    """Adopta snapshot y cambios escritos por otros workers (mirando como mucho cada SNAPSHOT_CHECK_S)."""
+    global _NEXT_CHECK
+    now = time.monotonic()
+    if now < _NEXT_CHECK or not _LOCK.acquire(blocking=False):
+        return snap
+    try:
+        _NEXT_CHECK = now + SNAPSHOT_CHECK_S
+        return _sync(snap)
+    finally:
+        _LOCK.release()
+
+def current_index() -> IndexSnapshot:
+    """Snapshot publicado (lo construye la primera vez). Tomarlo una vez por request."""
+    snap = _CURRENT
+    if snap is not None:
+        return _maybe_refresh(snap)
+    with _LOCK:
+        if _CURRENT is None:
+            productos, path = load_products()
+            _publish(_build_snapshot(productos, path, None))
+        return _CURRENT
+
+def reload_index() -> IndexSnapshot:
+    """Relee el catálogo de disco, construye el índice aparte y lo publica de una vez.
+
+    Antes vuelca en el JSON los cambios pendientes del log (compactación).
+    """
+    path = _resolve_path()
+    with _LOCK, catalog_changes.locked(path):
+        base = catalog_snapshot.disk_generation(path)
+        pending = catalog_changes.compact(path, base)
+        productos, path = reload_products()
+        # la generación nueva supera a la de cualquier worker que ya aplicó esos lotes
+        snap = _build_snapshot(productos, path, _CURRENT, base + pending + 1 if pending else None)
+        catalog_changes.reset_log(path)
+        return _publish(snap._replace(log=None))
+
+def _noop(old: Optional[dict], patch: dict) -> bool:
+    return old is not None and all(old.get(k) == v for k, v in patch.items())
+
+def apply_changes(upserts: Mapping[str, dict], deletes: List[str]) -> IndexSnapshot:
+    """Registra un lote (parches por código + bajas) en el log y lo aplica sin reconstruir el índice.
+
+    Bajas de códigos que no existen y parches iguales al registro actual no cuentan: si no
+    queda nada, no se escribe el lote ni cambia la versión (las cachés siguen valiendo)."""
+    snap = current_index()
+    deletes = [c for c in dict.fromkeys(deletes) if c in snap.productos]
+    upserts = {c: p for c, p in upserts.items()
+               if c in deletes or not _noop(raw_record(snap.productos[c]) if c in snap.productos else None, p)}
+    if not upserts and not deletes:
+        return snap
+    # se normaliza antes de escribir: un lote en el log ya no se puede sacar (ValueError = parche inválido)
+    try:
+        catalog_changes.batch_records(snap.productos, {"upsert": upserts, "delete": deletes}, load_datasheets(snap.path))
+    except (TypeError, ValueError, AttributeError) as e:
+        raise ValueError(f"invalid product patch: {e}") from e
+    catalog_changes.append(snap.path, upserts, deletes)
+    with _LOCK:
+        snap = _sync(_CURRENT)
+    if snap.pending >= catalog_changes.COMPACT_AFTER:
+        _compact_in_background()
+    return snap
+
+def _compact_in_background():
+    if _COMPACTING.is_set():
         return
-    if not PRODUCTOS:
-        load_products()
-
-    _INDEX.clear(); _VOCAB.clear()
-
-    for code, p in PRODUCTOS.items():
-        name = set(_tok(p.get("name_norm") or p.get("name") or ""))
-        tags = set(_tok(" ".join(p.get("tags_norm") or p.get("tags") or [])))
-        cats = set(_tok(" ".join(p.get("categories_norm") or p.get("categories") or [])))
-        slug = set(p.get("slug_toks") or [])
-        codef = set(_tok(p.get("code") or ""))
-        blob = set(_tok(" ".join([
-            p.get("search_blob") or "",
-            p.get("name_norm") or "",
-            " ".join(p.get("categories_norm") or []),
-            " ".join(p.get("tags_norm") or []),
-            " ".join(slug or []),
-            p.get("code") or "",
-        ])))
-
-        _INDEX[code] = {"name": name, "tags": tags, "cats": cats, "slug": slug, "code": codef, "blob": blob}
-        for t in set().union(name, tags, cats, slug, codef, blob):
-            _VOCAB[t] = _VOCAB.get(t, 0) + 1
-
-    N = max(1, len(_INDEX))
-    _IDF.update({t: math.log((N + 1) / (df + 0.5)) + 1.0 for t, df in _VOCAB.items()})
-    _INDEX_READY = True
-
-def _idf(t: str) -> float:
-    return _IDF.get(t, 0.5)
+    _COMPACTING.set()
+
+    def run():
+        try:
+            reload_index()
+        except Exception:
+            logger.exception("Falló la compactación del catálogo.")
+        finally:
+            _COMPACTING.clear()
+
+    threading.Thread(target=run, name="catalog-compact", daemon=True).start()
+
+def warm_index() -> int:
+    """Construye (o carga del snapshot) el índice de inmediato; lo usa el arranque de la app."""
+    return current_index().packed.n_docs
+
+def _build_engine(packed: PackedIndex):
+    if SEARCH_ENGINE != "sparse":
+        return None
+    try:
+        from backend.services.sparse_engine import SparseEngine
+    except ImportError:
+        logger.warning("ECOLITE_SEARCH_ENGINE=sparse requiere numpy y scipy; se usa el motor Python.")
+        return None
+    return SparseEngine(packed)
+
+def _substrings(t: str, min_len: int = 2) -> Set[str]:
+    n = len(t)
+    return {t[i:j] for i in range(n) for j in range(i + min_len, n + 1)}
+
+def _term_id(ix: PackedIndex, t: str) -> Optional[int]:
+    return ix.terms.find(t)
+
+def _matching_terms(ix: PackedIndex, t: str) -> Set[int]:
+    """Ids de términos del vocab con los que `t` hace match exacto o parcial (t in v / v in t)."""
+    out = set(ix.substring_terms(t))
+    for sub in _substrings(t):
+        tid = _term_id(ix, sub)
+        if tid is not None:
+            out.add(tid)
+    return out
+
+def _idf(ix: PackedIndex, t: str) -> float:
+    tid = _term_id(ix, t)
+    if tid is None:
+        return 0.5
+    N = max(1, ix.n_docs)
+    return math.log((N + 1) / (ix.df[tid] + 0.5)) + 1.0
+
+# (id exacto o None, ids con match parcial, idf) por término de la consulta
+QueryTerm = Tuple[Optional[int], Set[int], float]
+
+def _query_info(ix: PackedIndex, q: List[str]) -> List[QueryTerm]:
+    return [(_term_id(ix, t), _matching_terms(ix, t), _idf(ix, t)) for t in q]
+
+def _candidate_rows(ix: PackedIndex, qinfo: List[QueryTerm]) -> List[int]:
+    """Filas que comparten al menos un término (exacto o parcial) con la consulta, en orden de catálogo."""
+    terms: Set[int] = set()
+    for _, match, _ in qinfo:
+        terms |= match
+    rows: Set[int] = set()
+    for tid in terms:
+        rows.update(ix.postings(tid))
+    return sorted(rows)
 
 def _ngrams(s: str, n: int = 3) -> Set[str]:
     s = f" {s} "
     return {s[i:i+n] for i in range(max(0, len(s) - n + 1))}
 
-def _char_sim(a: str, b: str) -> float:
-    A = _ngrams(a); B = _ngrams(b)
-    if not A or not B:
-        return 0.0
-    return len(A & B) / len(A | B)
+def _similar_terms(ix: PackedIndex, t: str, threshold: float = 0.35) -> List[Tuple[str, float]]:
+    """Términos del vocab con Jaccard de trigramas (t, v) >= threshold, contando trigramas compartidos.
+
+    Se devuelven en orden de aparición en el vocab, igual que el barrido completo.
+    """
+    A = _ngrams(t)
+    shared: Dict[int, int] = {}
+    for g in A:
+        for tid in ix.gram_terms(g):
+            shared[tid] = shared.get(tid, 0) + 1
+    out: List[Tuple[int, float]] = []
+    for tid, c in shared.items():
+        sim = c / (len(A) + ix.term_ngrams[tid] - c)
+        if sim >= threshold:
+            out.append((tid, sim))
+    out.sort(key=lambda x: ix.term_pos[x[0]])
+    return [(ix.terms[tid], sim) for tid, sim in out]
 
 # ----------- Morfología simple (ES) data-driven -----------
-def _morph_variants(tok: str) -> List[str]:
+def _morph_variants(ix: PackedIndex, tok: str) -> List[str]:
     """Devuelve variantes singular/plural SI existen en el vocabulario."""
     out = [tok]
     # reglas genéricas y seguras
@@ -100,12 +370,11 @@ def _morph_variants(tok: str) -> List[str]:
         cand.append(tok[:-5] + "ion")  # instalaciones -> instalacion
 
     for c in cand:
-        if c in _VOCAB and c not in out:
+        if _term_id(ix, c) is not None and c not in out:
             out.append(c)
     return out
 
-def _expand_query_tokens(q_toks: List[str], k_fallback: int = 6) -> List[str]:
-    _ensure_index()
+def _expand_query_tokens(ix: PackedIndex, q_toks: List[str], k_fallback: int = 6) -> List[str]:
     base = [t for t in q_toks if t not in _STOPWORDS_ES]
     if not base:
         return []
@@ -113,91 +382,185 @@ def _expand_query_tokens(q_toks: List[str], k_fallback: int = 6) -> List[str]:
     # morfología: añade variantes presentes en el vocab
     morph: Set[str] = set()
     for t in base:
-        for v in _morph_variants(t):
+        for v in _morph_variants(ix, t):
             morph.add(v)
 
-    # similitud de caracteres sobre vocab
+    # similitud de caracteres sobre vocab (vía índice de trigramas)
     cand: Dict[str, float] = {}
     for t in base + list(morph):
-        for v in _VOCAB.keys():
-            sim = _char_sim(t, v)
-            if sim >= 0.35:
-                cand[v] = max(cand.get(v, 0.0), sim)
+        for v, sim in _similar_terms(ix, t, 0.35):
+            cand[v] = max(cand.get(v, 0.0), sim)
 
-    return sorted(cand.keys(), key=lambda x: (-cand[x], -_idf(x)))[:k_fallback]
+    return sorted(cand.keys(), key=lambda x: (-cand[x], -_idf(ix, x)))[:k_fallback]
 
-def _score_product(code: str, q_toks: List[str], expand: List[str]) -> float:
-    f = _INDEX[code]
-    name, tags, cats, slug, codef, blob = f["name"], f["tags"], f["cats"], f["slug"], f["code"], f["blob"]
+def _query_terms(q_toks: List[str], expand: List[str]) -> List[str]:
     q = [t for t in q_toks if t not in _STOPWORDS_ES]
-    q = list(dict.fromkeys(q + [e for e in expand if e not in q]))
-    if not q:
+    return list(dict.fromkeys(q + [e for e in expand if e not in q]))
+
+def _score_product(ix: PackedIndex, code: str, q_toks: List[str], expand: List[str]) -> float:
+    q = _query_terms(q_toks, expand)
+    row = ix.codes.find(code)
+    if not q or row is None:
         return 0.0
+    return _score_row(ix, row, _query_info(ix, q))
 
-    def field_match(field: Set[str]) -> float:
+def _score_row(ix: PackedIndex, row: int, qinfo: List[QueryTerm]) -> float:
+    def field_match(f: str) -> float:
+        field = set(ix.field(f, row))
         score = 0.0
-        for t in q:
-            if t in field:
-                score += _idf(t) * 1.0
-            elif any(t in ft or ft in t for ft in field):
-                score += _idf(t) * 0.5
-        exact = sum(1 for t in q if t in field)
-        sub = 0
-        for t in q:
-            if any(t in ft or ft in t for ft in field):
+        exact = sub = 0
+        for tid, match, idf in qinfo:
+            if tid is not None and tid in field:
+                score += idf * 1.0
+                exact += 1
+                sub += 1
+            elif not field.isdisjoint(match):
+                score += idf * 0.5
                 sub += 1
         return score + 0.15 * (exact + sub)
 
-    s_name = field_match(name)
-    s_tags = field_match(tags)
-    s_cats = field_match(cats)
-    s_slug = field_match(slug)
-    s_code = field_match(codef)
-    s_blob = field_match(blob) * 0.6
+    s_name = field_match("name")
+    s_tags = field_match("tags")
+    s_cats = field_match("cats")
+    s_slug = field_match("slug")
+    s_code = field_match("code")
+    s_blob = field_match("blob") * 0.6
 
     return (1.6 * s_name) + (1.0 * s_cats) + (0.9 * s_slug) + (0.7 * s_tags) + (0.5 * s_code) + (1.2 * s_blob)
 
-def _paginate(items: List[Dict], limit: int, offset: int, exclude_codes: Set[str] | None = None) -> List[Dict]:
-    exclude_codes = exclude_codes or set()
-    out = [it for it in items if it["code"] not in exclude_codes]
-    return out[offset: offset + limit]
+def _payload(ix: PackedIndex, row: int) -> Dict:
+    p = ix.record(row)
+    return {"code": p.get("code"), "name": p.get("name"), "price": p.get("price"), "url": p.get("url"), "img_url": p.get("img_url")}
 
-def search_candidates(user_msg: str, state: dict, limit: int = 5, offset: int = 0, exclude_codes: List[str] | None = None) -> List[Dict]:
-    _ensure_index()
-    text = _norm(user_msg)
-    q_toks = _tok(text)
+def _top_rows(ix: PackedIndex, scored: Iterable[Tuple[float, int]], k: int) -> List[int]:
+    """Selecciona con heap solo las k mejores filas (score desc, código asc)."""
+    if k <= 0:
+        return []
+    codes = ix.codes
+    return [row for _, _, row in heapq.nsmallest(k, ((-s, codes[row], row) for s, row in scored))]
+
+# Si ningún producto cumple todos los filtros se relajan en este orden: primero el presupuesto
+# (las specs definen el producto buscado), luego IP/CCT (casi nunca vienen en el nombre)
+_RELAX_ORDER = (("price_min", "price_max"), ("ip",), ("cct_min", "cct_max"), ("volt_min", "volt_max"), ("watts",))
+
+def _spec_mask(specs: SpecTable, filters):
+    """Máscara (orden de catálogo) de los filtros de specs; None si no hay filtros o nada los cumple."""
+    for cols in (None,) + _RELAX_ORDER:
+        if cols:
+            filters = [f for f in filters if f[0] not in cols]
+        if not filters:
+            return None
+        mask = specs.mask(filters)
+        if any(mask):
+            return mask
+    return None
+
+def _rank(snap: IndexSnapshot, user_msg: str, seed: int, excluded: Set[int], k: int) -> Tuple[List[int], bool]:
+    """Hasta k filas en orden de ranking y si son todas las que hay."""
+    ix = snap.packed
+    with timed("search.tokenize"):
+        # filtros numéricos ("200W", "IP65", "6500K", "menos de $300.000") recortan candidatos antes del scoring
+        filters, user_msg = parse_query_filters(user_msg)
+        allowed = _spec_mask(snap.specs, filters)
+        q_toks = list(query_tokens(user_msg))
     useful = [t for t in q_toks if t not in _STOPWORDS_ES]
     if not useful:
-        return []
+        return [], True
+    with timed("search.spell"):
+        # typos ("reflestor" -> "reflector"): se corrige la palabra y sigue el camino indexado normal
+        q_toks = [t if t in _STOPWORDS_ES else snap.spell.correct(t) or t for t in q_toks]
+
+    with timed("search.expand"):
+        expand = _expand_query_tokens(ix, q_toks)
+        qinfo = _query_info(ix, _query_terms(q_toks, expand))
+    rng = random.Random(seed)
+
+    engine = snap.engine
+    if engine is not None:
+        with timed("search.score"):
+            scores = engine.score(qinfo)
+            if allowed is not None:
+                scores[~allowed] = 0.0
+            _, top = engine.rank(scores, rng, excluded, k)
+        return [row for _, row in top], len(top) < k
+
+    # Solo se puntúan productos que comparten algún término con la consulta;
+    # el resto tendría score 0. El jitter se consume en orden de catálogo.
+    with timed("search.score"):
+        scored: List[Tuple[float, int]] = []
+        for row in _candidate_rows(ix, qinfo):
+            if allowed is not None and not allowed[row]:
+                continue
+            score = _score_row(ix, row, qinfo)
+            if score <= 0:
+                continue
+            jitter = rng.random() * 0.01
+            if row not in excluded:
+                scored.append((score + jitter, row))
+        return _top_rows(ix, scored, k), len(scored) <= k
+
+def search_page(user_msg: str, state: dict, limit: int = 5, offset: int = 0, exclude_codes: List[str] | None = None,
+                index: IndexSnapshot | None = None) -> Tuple[List[Dict], bool]:
+    """Página de resultados y si hay más después de ella.
+
+    Si el mensaje es un código (o varios, o un prefijo de código) responde el índice de SKUs
+    sin rankear; un prefijo con más de PREFIX_MAX_ROWS filas guarda su lista en `ranked_cache`
+    y todas sus páginas salen del índice de SKUs. Si no, el ranking completo (hasta
+    RANKED_MAX_ROWS filas) queda en `ranked_cache` por (consulta, semilla, versión): las
+    páginas siguientes solo recortan la lista. `exclude_codes` se filtra sobre esa lista; el
+    jitter no depende de las exclusiones."""
+    # `index`: snapshot ya tomado por el llamador (p. ej. para informar su versión en la respuesta)
+    snap = index or current_index()
+    ix = snap.packed
+    seed = state.get("result_seed") or 0
+    key = (user_msg, seed, snap.version)
+    ranked = snap.skus.lookup(user_msg)
+    sku = ranked is not None
+    if sku:
+        inc("search.sku_hit")
+        if not ranked[1]:
+            ranked = RANKED.get(key)
+            if ranked is None:
+                rows, complete = snap.skus.lookup(user_msg, RANKED_MAX_ROWS)
+                ranked = (array("i", rows), complete)
+                RANKED.put(key, ranked)
+    else:
+        ranked = RANKED.get(key)
+    if ranked is None:
+        rows, complete = _rank(snap, user_msg, seed, set(), RANKED_MAX_ROWS)
+        ranked = (array("i", rows), complete)
+        RANKED.put(key, ranked)
+    rows, complete = ranked
+
+    end = offset + max(0, limit)
+    excluded = {row for row in map(ix.codes.find, exclude_codes or []) if row is not None}
+    if excluded:
+        rows = [row for row in rows if row not in excluded]
+    if len(rows) < end and not complete:
+        # más allá de lo guardado: se vuelve a pedir a la misma fuente solo hasta esta página (+1 para saber si hay más)
+        if sku:
+            rows, complete = snap.skus.lookup(user_msg, end + 1 + len(excluded))
+            rows = [row for row in rows if row not in excluded]
+        else:
+            rows, complete = _rank(snap, user_msg, seed, excluded, end + 1)
+    return [_payload(ix, row) for row in rows[offset:end]], len(rows) > end or not complete
+
+def similar_products(code: str, limit: int = 5, index: IndexSnapshot | None = None) -> Optional[List[Dict]]:
+    """Productos parecidos a `code` (código exacto o sin importar mayúsculas/guiones); None si no existe."""
+    snap = index or current_index()
+    ix = snap.packed
+    row = ix.codes.find(code)
+    if row is None:
+        row = snap.skus.exact.get(norm_code(code))
+    if row is None:
+        return None
+    return [dict(_payload(ix, r), score=round(sc, 4)) for r, sc in snap.similar.similar(row, limit)]
+
+def catalog_terms(user_msg: str, ignore: Set[str] = frozenset(), index: IndexSnapshot | None = None) -> List[str]:
+    """Palabras del mensaje (sin stopwords ni `ignore`) que son términos del catálogo."""
+    ix = (index or current_index()).packed
+    return [t for t in query_tokens(user_msg) if t not in _STOPWORDS_ES and t not in ignore and ix.terms.find(t) is not None]
 
-    expand = _expand_query_tokens(q_toks)
-    rng = random.Random(state.get("result_seed") or 0)
-
-    scored: List[Tuple[float, Dict]] = []
-    for code, p in PRODUCTOS.items():
-        score = _score_product(code, q_toks, expand)
-        if score <= 0:
-            continue
-        payload = {"code": code, "name": p.get("name"), "price": p.get("price"), "url": p.get("url"), "img_url": p.get("img_url")}
-        jitter = rng.random() * 0.01
-        scored.append((score + jitter, payload))
-
-    scored.sort(key=lambda x: (-x[0], x[1]["code"]))
-    flattened = [it for _, it in scored]
-
-    # ---- Fallback de RECALL si no hay resultados (fuzzy global sobre blob) ----
-    if not flattened:
-        q_str = " ".join(useful)
-        def broad_score(pcode: str) -> float:
-            blob = " ".join(_INDEX[pcode]["blob"]) if isinstance(_INDEX[pcode]["blob"], set) else " ".join(list(_INDEX[pcode]["blob"]))
-            return _char_sim(q_str, blob)
-        broad = []
-        for code, p in PRODUCTOS.items():
-            bs = broad_score(code)
-            if bs >= 0.12:  # umbral suave
-                payload = {"code": code, "name": p.get("name"), "price": p.get("price"), "url": p.get("url"), "img_url": p.get("img_url")}
-                broad.append((bs, payload))
-        broad.sort(key=lambda x: (-x[0], x[1]["code"]))
-        flattened = [it for _, it in broad]
-
-    return _paginate(flattened, limit=limit, offset=offset, exclude_codes=set(exclude_codes or []))
+def search_candidates(user_msg: str, state: dict, limit: int = 5, offset: int = 0, exclude_codes: List[str] | None = None,
+                      index: IndexSnapshot | None = None) -> List[Dict]:
+    return search_page(user_msg, state, limit, offset, exclude_codes, index)[0]
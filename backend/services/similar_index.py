@@ -0,0 +1,185 @@
+# backend/services/similar_index.py
+"""Productos parecidos: los k vecinos de cada producto, precalculados con el índice.
+
+Similitud entre dos productos (solo si comparten algún término):
+    0.75 · coseno de sus términos (name, cats, tags, slug, pesados por campo e idf)
+  + 0.15 · specs (vatios, CCT, IP, voltaje): promedio de min/max sobre las que ambos tienen
+  + 0.10 · precio: min/max
+
+`build` recorre el catálogo por bloques de filas: con numpy/scipy cada bloque es un
+producto disperso (bloque × catálogo) y specs/precio se calculan solo para los pares que
+todavía pueden entrar al top k; sin ellos, un cálculo en Python puro por listas invertidas
+(suficiente para catálogos chicos). El resultado se
+guarda en el snapshot como matriz n × k de filas vecinas (NONE = hueco) y sus scores.
+
+`SimilarIndex` lo sirve en O(1). Hasta la próxima compactación, los vecinos de las filas
+cambiadas o nuevas por el log de cambios (PackedDelta) se calculan al pedirlos, y las
+filas nuevas no aparecen todavía como vecinas de las demás.
+
+ECOLITE_SIMILAR_K=0 desactiva el cálculo.
+"""
+from __future__ import annotations
+import math, os
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from backend.services.packed_index import PackedDelta, PackedIndex
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # opcionales: se calcula en Python puro
+    np = sparse = None
+
+SIMILAR_K = int(os.getenv("ECOLITE_SIMILAR_K", "10"))
+# filas por bloque del cálculo vectorizado (memoria ~ bloque × catálogo × 4 bytes por matriz)
+BLOCK_ROWS = int(os.getenv("ECOLITE_SIMILAR_BLOCK_ROWS", "256"))
+
+FIELD_WEIGHTS = (("name", 1.0), ("cats", 0.8), ("tags", 0.6), ("slug", 0.5))
+SPEC_COLS = ("watts", "cct_min", "ip", "volt_min")
+W_TEXT, W_SPECS, W_PRICE = 0.75, 0.15, 0.10
+
+NONE = 0xFFFFFFFF
+
+Neighbors = List[Tuple[int, float]]  # (fila, score) de mayor a menor score
+
+def _col(ix, name: str) -> List[float]:
+    # NaN = desconocido; min/max solo tiene sentido con valores positivos
+    return [v if v > 0 else math.nan for v in ix.spec_cols[name]]
+
+class _NumpyFeatures:
+    def __init__(self, ix):
+        n, n_docs = ix.n, max(1, ix.n_docs)
+        idf = np.log1p(n_docs / np.maximum(np.array([ix.df[t] for t in range(ix.n_terms)], dtype=np.float32), 1))
+        x = None
+        for f, w in FIELD_WEIGHTS:
+            ptr, idx = ix.fields[f]
+            indices = np.frombuffer(idx, dtype=np.uint32).astype(np.int64)
+            m = sparse.csr_matrix((w * idf[indices], indices, np.frombuffer(ptr, dtype=np.uint32).astype(np.int64)),
+                                  shape=(n, ix.n_terms), dtype=np.float32)
+            x = m if x is None else x + m
+        norms = np.sqrt(np.asarray(x.multiply(x).sum(axis=1)).ravel())
+        self.x = sparse.diags(1 / np.where(norms > 0, norms, 1)).dot(x).tocsr().astype(np.float32)
+        self.xt = self.x.T.tocsc()
+        self.specs = [np.array(_col(ix, c), dtype=np.float32) for c in SPEC_COLS]
+        self.price = np.array(_col(ix, "price_min"), dtype=np.float32)
+
+    @staticmethod
+    def _ratio(a, b):
+        with np.errstate(invalid="ignore"):
+            return np.nan_to_num(np.minimum(a, b) / np.maximum(a, b))  # NaN (desconocido) -> 0
+
+    def block(self, s: int, e: int, k: int) -> List[Neighbors]:
+        b = e - s
+        text = W_TEXT * (self.x[s:e] @ self.xt).toarray()
+        text[np.arange(b), np.arange(s, e)] = 0
+        text[text <= 0] = -np.inf
+        # specs + precio suman a lo sumo W_SPECS + W_PRICE: solo se calculan para pares cuyo texto
+        # puede alcanzar el k-ésimo mejor de su fila (el resultado es exacto)
+        kk = min(k, text.shape[1])
+        if not kk:
+            return [[] for _ in range(b)]
+        kth = -np.partition(-text, kk - 1, axis=1)[:, kk - 1]
+        bi, cj = np.nonzero((text + (W_SPECS + W_PRICE) >= kth[:, None]) & np.isfinite(text))
+        gi = bi + s
+        total = np.zeros(len(bi), dtype=np.float32)
+        known = np.zeros(len(bi), dtype=np.float32)
+        for col in self.specs:
+            a, c = col[gi], col[cj]
+            total += self._ratio(a, c)
+            known += ~(np.isnan(a) | np.isnan(c))
+        spec = np.divide(total, known, out=np.zeros_like(total), where=known > 0)
+        score = text[bi, cj] + W_SPECS * spec + W_PRICE * self._ratio(self.price[gi], self.price[cj])
+        order = np.lexsort((cj, -score, bi))
+        bi, cj, score = bi[order], cj[order], score[order]
+        starts = np.searchsorted(bi, np.arange(b + 1))
+        return [list(zip(cj[starts[i]:starts[i] + kk].tolist(), score[starts[i]:starts[i] + kk].tolist()))
+                if starts[i + 1] > starts[i] else [] for i in range(b)]
+
+class _PyFeatures:
+    def __init__(self, ix):
+        n_docs = max(1, ix.n_docs)
+        self.vecs: List[Dict[int, float]] = []
+        self.inv: Dict[int, List[Tuple[int, float]]] = {}
+        for row in range(ix.n):
+            v: Dict[int, float] = {}
+            for f, w in FIELD_WEIGHTS:
+                for t in ix.field(f, row):
+                    v[t] = v.get(t, 0.0) + w * math.log1p(n_docs / max(ix.df[t], 1))
+            norm = math.sqrt(sum(x * x for x in v.values())) or 1.0
+            v = {t: x / norm for t, x in v.items()}
+            self.vecs.append(v)
+            for t, x in v.items():
+                self.inv.setdefault(t, []).append((row, x))
+        self.specs = [_col(ix, c) for c in SPEC_COLS]
+        self.price = _col(ix, "price_min")
+
+    @staticmethod
+    def _ratio(a: float, b: float) -> float:
+        return math.nan if a != a or b != b else min(a, b) / max(a, b)
+
+    def block(self, s: int, e: int, k: int) -> List[Neighbors]:
+        out = []
+        for row in range(s, e):
+            dots: Dict[int, float] = {}
+            for t, x in self.vecs[row].items():
+                for r, y in self.inv[t]:
+                    dots[r] = dots.get(r, 0.0) + x * y
+            dots.pop(row, None)
+            scored = []
+            for r, text in dots.items():
+                if text <= 0:
+                    continue
+                ratios = [self._ratio(col[row], col[r]) for col in self.specs]
+                ratios = [x for x in ratios if x == x]
+                spec = sum(ratios) / len(ratios) if ratios else 0.0
+                price = self._ratio(self.price[row], self.price[r])
+                scored.append((-(W_TEXT * text + W_SPECS * spec + W_PRICE * (0.0 if price != price else price)), r))
+            scored.sort()
+            out.append([(r, -sc) for sc, r in scored[:k]])
+        return out
+
+def _features(ix):
+    return _NumpyFeatures(ix) if np is not None else _PyFeatures(ix)
+
+def build(ix: PackedIndex, k: int = SIMILAR_K) -> Tuple[array, array, int]:
+    """-> (filas vecinas, scores, k): fila i en [i·k, (i+1)·k), con NONE / 0 de relleno."""
+    rows, scores = array("I"), array("f")
+    if k <= 0 or ix.n == 0:
+        return rows, scores, 0
+    feats = _features(ix)
+    for s in range(0, ix.n, max(1, BLOCK_ROWS)):
+        for nb in feats.block(s, min(ix.n, s + max(1, BLOCK_ROWS)), k):
+            rows.extend([r for r, _ in nb] + [NONE] * (k - len(nb)))
+            scores.extend([sc for _, sc in nb] + [0.0] * (k - len(nb)))
+    return rows, scores, k
+
+class SimilarIndex:
+    def __init__(self, ix):
+        self.ix = ix
+        self.base = ix.base if isinstance(ix, PackedDelta) else ix
+        self.k = getattr(self.base, "sim_k", 0)
+        self._feats = None
+        self._memo: Dict[int, Neighbors] = {}
+
+    def _stale(self, row: int) -> bool:
+        ix = self.ix
+        return not self.k or row >= self.base.n or (isinstance(ix, PackedDelta) and row in ix.rows)
+
+    def neighbors(self, row: int) -> Neighbors:
+        ix = self.ix
+        if not ix.is_live(row):
+            return []
+        if self._stale(row):
+            nb = self._memo.get(row)
+            if nb is None:
+                if self._feats is None:
+                    self._feats = _features(ix)
+                nb = self._memo[row] = self._feats.block(row, row + 1, self.k or SIMILAR_K)[0]
+            return nb
+        lo = row * self.k
+        rows, scores = self.base.sim_rows[lo:lo + self.k], self.base.sim_scores[lo:lo + self.k]
+        return [(r, float(sc)) for r, sc in zip(rows, scores) if r != NONE and ix.is_live(r)]
+
+    def similar(self, row: int, limit: int) -> Neighbors:
+        return self.neighbors(row)[:limit]
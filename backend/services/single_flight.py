@@ -0,0 +1,108 @@
+# backend/services/single_flight.py
+"""Coalescing de llamadas async idénticas en curso ("single flight").
+
+Mientras una llamada con cierta clave está en vuelo, las siguientes con la misma clave
+esperan su resultado en lugar de repetirla. La clave debe cubrir todo lo que determina
+el resultado (así compartirlo no cambia nada para quien espera). La llamada corre como
+task propia: si el cliente que la inició se desconecta, los demás la siguen esperando.
+
+`stream` hace lo mismo para generadores async (p. ej. la respuesta del LLM por fragmentos):
+cada suscriptor recibe todos los fragmentos desde el principio.
+"""
+from __future__ import annotations
+import asyncio
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, TypeVar
+
+T = TypeVar("T")
+
+# claves con métricas que se conservan por instancia (LRU)
+STATS_MAX_KEYS = 500
+
+class _Broadcast:
+    """Un generador async consumido una vez y repartido a varios suscriptores."""
+
+    def __init__(self, agen: AsyncIterator[str]):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self._cond = asyncio.Condition()
+        self.task = asyncio.ensure_future(self._pump(agen))
+
+    async def _pump(self, agen: AsyncIterator[str]):
+        try:
+            async for chunk in agen:
+                self.chunks.append(chunk)
+                async with self._cond:
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            async with self._cond:
+                self._cond.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        i = 0
+        while True:
+            if i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+                continue
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            async with self._cond:
+                await self._cond.wait_for(lambda: i < len(self.chunks) or self.done)
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, object] = {}
+        # etiqueta legible -> [llamadas, coalescidas]
+        self._stats: "OrderedDict[str, List[int]]" = OrderedDict()
+        self.calls = self.coalesced = 0
+
+    def _count(self, label: str, coalesced: bool):
+        s = self._stats.get(label)
+        if s is None:
+            s = self._stats[label] = [0, 0]
+            while len(self._stats) > STATS_MAX_KEYS:
+                self._stats.popitem(last=False)
+        self._stats.move_to_end(label)
+        s[0] += 1
+        s[1] += coalesced
+        self.calls += 1
+        self.coalesced += coalesced
+
+    def _forget(self, key: Hashable, entry: object):
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]], label: str = "") -> T:
+        task = self._inflight.get(key)
+        self._count(label or str(key), task is not None)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: (self._forget(key, t), t.cancelled() or t.exception()))
+        return await asyncio.shield(task)
+
+    async def stream(self, key: Hashable, fn: Callable[[], AsyncIterator[str]], label: str = "") -> AsyncIterator[str]:
+        b = self._inflight.get(key)
+        self._count(label or str(key), b is not None)
+        if b is None:
+            b = _Broadcast(fn())
+            self._inflight[key] = b
+            b.task.add_done_callback(lambda _: self._forget(key, b))
+        async for chunk in b.subscribe():
+            yield chunk
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "keys": {k: {"calls": s[0], "coalesced": s[1]} for k, s in reversed(self._stats.items())},
+        }
@@ -0,0 +1,82 @@
+# backend/services/sku_index.py
+"""Índice de códigos de producto (SKU) para responder sin pasar por el ranker.
+
+Se arma con cada snapshot: código exacto, código normalizado (mayúsculas, solo letras y
+dígitos: "ving125-c" -> "VING125C") y un trie por prefijo del normalizado. Cada nodo del
+trie guarda sus primeras filas en orden de código, así la consulta cuesta O(largo del código).
+Las páginas siguientes de un prefijo con más filas salen de la lista ordenada de códigos
+(bisección), en el mismo orden.
+"""
+from __future__ import annotations
+import re
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from backend.services.packed_index import PackedIndex
+
+# filas guardadas por nodo del trie (un prefijo corto no necesita listar todo el catálogo)
+PREFIX_MAX_ROWS = 50
+# prefijo mínimo para buscar por prefijo ("led" no es un código a medias)
+PREFIX_MIN_LEN = 4
+
+_ROWS = ""  # clave de las filas dentro de un nodo (los hijos son caracteres)
+
+def norm_code(s: str) -> str:
+    return re.sub(r"[^0-9A-Z]+", "", (s or "").upper())
+
+def _looks_like_code(tok: str) -> bool:
+    # lo que la gente pega: con dígitos o guion, o todo en mayúsculas ("NICHA")
+    return any(c.isdigit() or c == "-" for c in tok) or tok.isupper()
+
+class SkuIndex:
+    def __init__(self, ix: PackedIndex):
+        codes = ix.codes
+        live = sorted((norm_code(codes[row]), row) for row in range(ix.n) if ix.is_live(row))
+        self._keys, self._rows = [k for k, _ in live], [r for _, r in live]
+        self.exact: Dict[str, int] = {}
+        self.trie: Dict = {_ROWS: ([], 0)}
+        for key, row in live:
+            if not key:
+                continue
+            self.exact.setdefault(key, row)
+            node = self.trie
+            for ch in key:
+                node = node.setdefault(ch, {_ROWS: ([], 0)})
+                rows, total = node[_ROWS]
+                if total < PREFIX_MAX_ROWS:
+                    rows.append(row)
+                node[_ROWS] = (rows, total + 1)
+
+    def prefix(self, key: str) -> Tuple[List[int], int]:
+        """(primeras filas con ese prefijo en orden de código, total con ese prefijo)."""
+        node = self.trie
+        for ch in key:
+            node = node.get(ch)
+            if node is None:
+                return [], 0
+        return node[_ROWS]
+
+    def prefix_rows(self, key: str, limit: int) -> Tuple[List[int], int]:
+        """Como `prefix` pero hasta `limit` filas (sin el tope de PREFIX_MAX_ROWS)."""
+        lo, hi = bisect_left(self._keys, key), bisect_left(self._keys, key + "\x7f")
+        return self._rows[lo:min(hi, lo + limit)], hi - lo
+
+    def lookup(self, user_msg: str, max_rows: int = PREFIX_MAX_ROWS) -> Optional[Tuple[List[int], bool]]:
+        """Filas si el mensaje es uno o varios códigos (exactos) o un prefijo de código; None si no.
+
+        -> (filas, ¿completa?). Con un solo código, tras el exacto (el más corto: va primero en
+        el trie) van los que lo extienden."""
+        toks = (user_msg or "").split()
+        if not toks:
+            return None
+        keys = [norm_code(t) for t in toks]
+        if len(toks) > 1:
+            rows = [self.exact.get(k) for k in keys]
+            return (list(dict.fromkeys(rows)), True) if all(r is not None for r in rows) else None
+        key, hit = keys[0], self.exact.get(keys[0])
+        if len(key) < PREFIX_MIN_LEN or not _looks_like_code(toks[0]):
+            return ([hit], True) if hit is not None else None
+        rows, total = self.prefix(key)
+        if total > len(rows) and max_rows > len(rows):
+            rows, total = self.prefix_rows(key, max_rows)
+        return (rows, len(rows) >= total) if rows else None
@@ -0,0 +1,80 @@
+# backend/services/sparse_engine.py
+"""Motor de scoring vectorizado (NumPy/SciPy) equivalente a `_score_row`.
+
+Por campo f y término de consulta t, `field_match` (ver `_score_row`) aporta
+    idf(t) + 0.3          si t está en el campo (match exacto)
+    0.5·idf(t) + 0.15     si solo hay match parcial (t in v / v in t)
+es decir (0.5·idf(t) + 0.15)·(parcial + exacto), ya que todo exacto es también parcial.
+Con X = [X_name | X_cats | ...] (productos × campos·vocab, binaria) y una matriz de
+consulta con una columna "parcial" y otra "exacta" por (campo, término), el score
+de todo el catálogo sale de un único producto disperso seguido de un producto matriz-vector.
+
+Es opcional: se activa con ECOLITE_SEARCH_ENGINE=sparse y requiere numpy y scipy.
+tests/test_sparse_engine.py compara ambos motores sobre un set fijo de consultas.
+"""
+from __future__ import annotations
+import random
+from typing import List, Optional, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from backend.services.packed_index import PackedIndex
+
+# Mismos pesos que `_score_row` (blob: 1.2 × 0.6); las matrices salen de los CSR del índice empaquetado
+FIELDS: Tuple[Tuple[str, float], ...] = (
+    ("name", 1.6), ("cats", 1.0), ("slug", 0.9), ("tags", 0.7), ("code", 0.5), ("blob", 1.2 * 0.6),
+)
+
+class SparseEngine:
+    def __init__(self, packed: PackedIndex):
+        self.packed = packed
+        self.n_terms = packed.n_terms
+        blocks = []
+        for field, _ in FIELDS:
+            ptr, idx = packed.fields[field]
+            indptr = np.frombuffer(ptr, dtype=np.uint32).astype(np.int64)
+            indices = np.frombuffer(idx, dtype=np.uint32).astype(np.int64)
+            data = np.ones(len(indices), dtype=np.float64)
+            blocks.append(sparse.csr_matrix((data, indices, indptr), shape=(packed.n, self.n_terms)))
+        self.X = sparse.hstack(blocks, format="csr")
+        self.weights = np.array([w for _, w in FIELDS], dtype=np.float64)
+
+    def score(self, qinfo: List[Tuple[Optional[int], Set[int], float]]) -> np.ndarray:
+        """Score de cada fila (orden de catálogo) para los términos ya expandidos (id exacto, ids parciales, idf)."""
+        nq, nf, V = len(qinfo), len(FIELDS), self.n_terms
+        rows: List[int] = []
+        cols: List[int] = []
+        for j, (exact, partial, _) in enumerate(qinfo):
+            for f in range(nf):
+                base = f * V
+                rows.extend(base + i for i in partial)
+                cols.extend([f * nq + j] * len(partial))
+                if exact is not None:
+                    rows.append(base + exact)
+                    cols.append(nf * nq + f * nq + j)
+        Q = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float64), (rows, cols)), shape=(nf * V, 2 * nf * nq)
+        )
+        hits = (self.X @ Q) > 0
+        c = np.array([0.5 * idf + 0.15 for _, _, idf in qinfo], dtype=np.float64)
+        coef = np.outer(self.weights, c).ravel()
+        return np.asarray(hits @ np.concatenate([coef, coef])).ravel()
+
+    def rank(self, scores: np.ndarray, rng: random.Random, excluded: Set[int], k: int) -> Tuple[int, List[Tuple[float, int]]]:
+        """Aplica jitter (en orden de catálogo, como el motor Python) y devuelve (hits, top-k filas)."""
+        pos = np.flatnonzero(scores > 0)
+        hits = len(pos)
+        if not hits or k <= 0:
+            return hits, []
+        final = scores[pos] + np.array([rng.random() for _ in range(len(pos))]) * 0.01
+        if excluded:
+            keep = np.array([int(i) not in excluded for i in pos], dtype=bool)
+            pos, final = pos[keep], final[keep]
+        if len(pos) > k:
+            top = np.argpartition(-final, k - 1)[:k]
+            pos, final = pos[top], final[top]
+        codes = self.packed.codes
+        out = [(float(s), int(i)) for s, i in zip(final, pos)]
+        out.sort(key=lambda x: (-x[0], codes[x[1]]))
+        return hits, out
@@ -0,0 +1,150 @@
+# backend/services/specs.py
+"""Especificaciones numéricas (vatios, CCT, IP, voltaje, precio) y filtros por rango.
+
+`parse_specs` se llama al cargar cada registro; `SpecTable` guarda los valores en
+columnas `array('d')` (NaN = desconocido) alineadas con el orden del catálogo para
+filtrar con máscaras vectorizadas (NumPy si está disponible) antes del scoring.
+"""
+from __future__ import annotations
+import math, operator, re
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional: se filtra en Python puro
+    np = None
+
+SPEC_FIELDS = ("watts", "cct_min", "cct_max", "ip", "volt_min", "volt_max", "price_min", "price_max")
+
+# (columna, operador, valor); operador en "==", "<=", ">="
+SpecFilter = Tuple[str, str, float]
+
+_OPS = {"==": operator.eq, "<=": operator.le, ">=": operator.ge}
+
+_WATTS = re.compile(r"(?<![\w.])(\d{1,4}(?:[.,]\d+)?)\s*w\b")
+_CCT = re.compile(r"(?<![\w.])(\d{4})\s*k\b")
+_IP = re.compile(r"\bip\s*(\d{2})\b")
+_VOLT_RANGE = re.compile(r"(?<![\w.])(?:ac|dc)?\s*(\d{1,3})\s*-\s*(\d{1,3})\s*v\b")
+_VOLT = re.compile(r"(?<![\w.\-])(?:ac|dc)?(\d{1,3}(?:\.\d+)?)\s*v\b")
+_AMOUNT = re.compile(r"\d[\d.]*(?:,\d+)?")
+
+# "3000k" / "4000 K" (4+ cifras y k) es temperatura de color, no un monto: "hasta 3000k" no es precio
+_NUM = r"\$?\s*(?!\d{4,}\s*k\b)(\d[\d.,]*)\s*(millones|millon|mil|k)?\b"
+_PRICE_MAX = re.compile(
+    r"\b(?:menos de|menor a|por debajo de|bajo|hasta|maximo|max|no mas de|under|presupuesto de|presupuesto)\s*" + _NUM
+)
+_PRICE_MIN = re.compile(r"\b(?:mas de|mayor a|desde|minimo|over|sobre)\s*" + _NUM)
+_PRICE_BETWEEN = re.compile(r"\bentre\s*" + _NUM + r"\s*y\s*" + _NUM)
+
+def _num(s: str) -> float:
+    return float(s.replace(",", "."))
+
+def parse_price(price: str | None) -> Tuple[Optional[float], Optional[float]]:
+    """"$24.080" -> (24080, 24080); "$259.466-$363.814" -> (259466, 363814)."""
+    vals = []
+    for m in _AMOUNT.findall(price or ""):
+        vals.append(float(m.split(",")[0].replace(".", "")))
+    if not vals:
+        return None, None
+    return min(vals), max(vals)
+
+def _amount(num: str, unit: str | None) -> float:
+    """Monto escrito por el usuario: "300.000", "300 mil", "300k", "1,5 millones"."""
+    if unit in ("millones", "millon"):
+        return _num(num.replace(".", "")) * 1_000_000
+    if unit in ("mil", "k"):
+        return _num(num.replace(".", "")) * 1_000
+    return float(num.split(",")[0].replace(".", ""))
+
+def parse_specs(text: str, price: str | None = None, known: Dict | None = None) -> Dict[str, Optional[float]]:
+    """Extrae specs numéricas de texto normalizado (nombre + tags). `known` tiene prioridad."""
+    out: Dict[str, Optional[float]] = dict.fromkeys(SPEC_FIELDS)
+    m = _WATTS.search(text)
+    if m: out["watts"] = _num(m.group(1))
+    m = _CCT.search(text)
+    if m and 1800 <= int(m.group(1)) <= 10000: out["cct_min"] = out["cct_max"] = float(m.group(1))
+    m = _IP.search(text)
+    if m: out["ip"] = float(m.group(1))
+    m = _VOLT_RANGE.search(text)
+    if m:
+        out["volt_min"], out["volt_max"] = float(m.group(1)), float(m.group(2))
+    else:
+        m = _VOLT.search(text)
+        if m: out["volt_min"] = out["volt_max"] = _num(m.group(1))
+    out["price_min"], out["price_max"] = parse_price(price)
+    known = dict(known or {})
+    # CCT única o variantes (-C/-N/-F) como rango
+    ccts = [known.pop("cct")] if known.get("cct") is not None else known.get("cct_options") or []
+    if ccts:
+        out["cct_min"], out["cct_max"] = float(min(ccts)), float(max(ccts))
+    for k, v in known.items():
+        if k in out and v is not None:
+            out[k] = float(v)
+    return out
+
+def parse_query_filters(text: str) -> Tuple[List[SpecFilter], str]:
+    """Filtros de la consulta y el texto sin las expresiones de precio (que no aportan al scoring)."""
+    t = (text or "").lower()
+    t = t.translate(str.maketrans("áéíóú", "aeiou"))
+    filters: List[SpecFilter] = []
+
+    m = _PRICE_BETWEEN.search(t)
+    if m:
+        a, b = _amount(m.group(1), m.group(2)), _amount(m.group(3), m.group(4))
+        filters += [("price_min", "<=", max(a, b)), ("price_max", ">=", min(a, b))]
+        t = t[:m.start()] + " " + t[m.end():]
+    else:
+        m = _PRICE_MAX.search(t)
+        if m:
+            filters.append(("price_min", "<=", _amount(m.group(1), m.group(2))))
+            t = t[:m.start()] + " " + t[m.end():]
+        m = _PRICE_MIN.search(t)
+        if m:
+            filters.append(("price_max", ">=", _amount(m.group(1), m.group(2))))
+            t = t[:m.start()] + " " + t[m.end():]
+
+    m = _WATTS.search(t)
+    if m: filters.append(("watts", "==", _num(m.group(1))))
+    m = _CCT.search(t)
+    if m and 1800 <= int(m.group(1)) <= 10000:
+        filters += [("cct_min", "<=", float(m.group(1))), ("cct_max", ">=", float(m.group(1)))]
+    m = _IP.search(t)
+    if m: filters.append(("ip", ">=", float(m.group(1))))
+    m = _VOLT.search(t)
+    if m:
+        v = _num(m.group(1))
+        filters += [("volt_min", "<=", v), ("volt_max", ">=", v)]
+    return filters, t
+
+class SpecTable:
+    """Columnas de specs alineadas con `codes` (orden de catálogo)."""
+
+    def __init__(self, codes: List[str], specs: Iterable[Dict[str, Optional[float]]]):
+        self.n = len(codes)
+        self.cols: Dict[str, Sequence[float]] = {f: array("d") for f in SPEC_FIELDS}
+        for sp in specs:
+            for f in SPEC_FIELDS:
+                v = sp.get(f)
+                self.cols[f].append(math.nan if v is None else float(v))
+
+    @classmethod
+    def from_columns(cls, n: int, cols: Dict[str, Sequence[float]]) -> "SpecTable":
+        """Sobre columnas float64 ya existentes (p. ej. memoryviews del índice empaquetado), sin copiarlas."""
+        table = cls.__new__(cls)
+        table.n = n
+        table.cols = {f: cols[f] for f in SPEC_FIELDS}
+        return table
+
+    def mask(self, filters: List[SpecFilter]):
+        """Máscara booleana de productos que cumplen todos los filtros (NaN nunca cumple)."""
+        if np is not None:
+            m = np.ones(self.n, dtype=bool)
+            for col, op, val in filters:
+                m &= _OPS[op](np.frombuffer(self.cols[col], dtype=np.float64), val)
+            return m
+        m = [True] * self.n
+        for col, op, val in filters:
+            f, a = _OPS[op], self.cols[col]
+            m = [ok and f(a[i], val) for i, ok in enumerate(m)]
+        return m
@@ -0,0 +1,78 @@
+# backend/services/spell_index.py
+"""Corrección de typos estilo SymSpell sobre el vocabulario del índice.
+
+Se arma con cada snapshot: para cada término del vocab, todas las variantes que salen de
+borrarle hasta MAX_EDIT letras -> ids de término. Para corregir una palabra se generan sus
+propios borrados y se buscan en ese diccionario: cuesta lo mismo con 400 términos que con
+400.000, sin recorrer el catálogo. Los candidatos se confirman con distancia de edición
+(Damerau, transposición adyacente = 1).
+"""
+from __future__ import annotations
+import os
+from typing import Dict, List, Optional, Set
+
+from backend.services.packed_index import PackedIndex
+
+MAX_EDIT = int(os.getenv("ECOLITE_SPELL_MAX_EDIT", "2"))
+MIN_LEN = 4  # palabras más cortas no se corrigen ("ip", "led", "gu")
+
+def _deletes(word: str, d: int) -> Set[str]:
+    out, frontier = {word}, {word}
+    for _ in range(d):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - out
+        out |= frontier
+    return out
+
+def _max_edit(word: str) -> int:
+    # palabras cortas: 1 error (a distancia 2 "poste" también sería "porte", "pote"...)
+    return min(MAX_EDIT, 1 if len(word) <= 5 else 2)
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Damerau-Levenshtein (OSA) acotada: devuelve limit + 1 si se pasa."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+class SpellIndex:
+    def __init__(self, ix: PackedIndex):
+        self.ix = ix
+        self.deletes: Dict[str, List[int]] = {}
+        terms, df = ix.terms, ix.df
+        for tid in range(len(terms)):
+            t = terms[tid]
+            if len(t) >= MIN_LEN - MAX_EDIT and t.isalpha() and df[tid] > 0:
+                for d in _deletes(t, MAX_EDIT):
+                    self.deletes.setdefault(d, []).append(tid)
+
+    def correct(self, word: str) -> Optional[str]:
+        """Término del vocab más cercano a `word` si `word` no se reconoce; None si no hace falta
+        o no hay ninguno a distancia aceptable. Desempate: más documentos, luego orden del vocab."""
+        ix = self.ix
+        if len(word) < MIN_LEN or not word.isalpha() or ix.terms.find(word) is not None:
+            return None
+        if next(iter(ix.substring_terms(word)), None) is not None:
+            return None  # es parte de un término ("lamp" -> "lampara"): ya matchea parcial
+        limit = _max_edit(word)
+        cands: Set[int] = set()
+        for d in _deletes(word, limit):
+            cands.update(self.deletes.get(d, ()))
+        best = None
+        for tid in cands:
+            dist = edit_distance(word, ix.terms[tid], limit)
+            if dist <= limit:
+                key = (dist, -ix.df[tid], ix.term_pos[tid], tid)
+                if best is None or key < best:
+                    best = key
+        return ix.terms[best[3]] if best else None
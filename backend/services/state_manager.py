@@ -1,26 +1,179 @@
 # backend/services/state_manager.py
+"""Estado de conversación por sesión.
+
+`SessionState` es compacto (__slots__) y serializable (los sets van como listas), y se
+guarda en un store con TTL por sesión (se renueva con cada uso) y tope de sesiones (LRU):
+
+ECOLITE_SESSION_STORE = memory (por proceso, por defecto) | sqlite (archivo compartido entre
+workers, ECOLITE_SESSION_STORE_PATH; sobrevive reinicios).
+
+Con el store en memoria `get_state` devuelve el objeto vivo; con sqlite es una copia y hay
+que guardarla con `save_state` (o usar `update_state`).
+"""
 from __future__ import annotations
-import re
-from typing import Literal
-
-_SESSIONS: dict[str, dict] = {}
-
-def get_state(session_id: str) -> dict:
-    if session_id not in _SESSIONS:
-        _SESSIONS[session_id] = {
-            "espacio": None,
-            "espacio_source": None,
-            "necesidad": None,
-            "preferencias": {"vatios": None, "temp_color": None, "instalacion": None, "presupuesto": None},
-            "last_query": None,
-            "last_filter": None,
-            "last_items": [],
-            "page": 0,
-            "seen_codes": set(),
-            "focus": set(),
-            "result_seed": 0,
-        }
-    return _SESSIONS[session_id]
+import json, os, re, sqlite3, threading, time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Literal, Optional, Tuple
+
+SESSION_STORE = os.getenv("ECOLITE_SESSION_STORE", "memory").strip().lower()
+SESSION_STORE_PATH = Path(os.getenv("ECOLITE_SESSION_STORE_PATH") or Path(__file__).parent.parent / "data" / "sessions.sqlite3")
+SESSION_TTL_S = float(os.getenv("ECOLITE_SESSION_TTL_S", "1800"))
+SESSION_MAX = int(os.getenv("ECOLITE_SESSION_MAX", "10000"))
+
+class SessionState:
+    """Estado de una sesión. Acepta también acceso tipo dict (`s["page"]`, `s.get(...)`)."""
+    __slots__ = ("espacio", "espacio_source", "necesidad", "preferencias", "last_query", "last_filter",
+                 "last_items", "page", "seen_codes", "focus", "result_seed")
+    _SETS = ("seen_codes", "focus")
+
+    def __init__(self):
+        self.espacio = None
+        self.espacio_source = None
+        self.necesidad = None
+        self.preferencias = {"vatios": None, "temp_color": None, "instalacion": None, "presupuesto": None}
+        self.last_query = None
+        self.last_filter = None
+        self.last_items = []
+        self.page = 0
+        self.seen_codes = set()
+        self.focus = set()
+        self.result_seed = 0
+
+    def __getitem__(self, k: str) -> Any:
+        try:
+            return getattr(self, k)
+        except AttributeError:
+            raise KeyError(k) from None
+
+    def __setitem__(self, k: str, v: Any):
+        try:
+            setattr(self, k, v)
+        except AttributeError:
+            raise KeyError(k) from None
+
+    def __contains__(self, k: str) -> bool:
+        return k in self.__slots__
+
+    def get(self, k: str, default: Any = None) -> Any:
+        return getattr(self, k, default)
+
+    def update(self, delta: Dict[str, Any]):
+        for k, v in delta.items():
+            self[k] = v
+
+    def to_json(self) -> str:
+        d = {k: getattr(self, k) for k in self.__slots__}
+        for k in self._SETS:
+            d[k] = sorted(d[k])
+        return json.dumps(d, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw: str) -> "SessionState":
+        s = cls()
+        for k, v in json.loads(raw).items():
+            if k in cls.__slots__:
+                setattr(s, k, set(v) if k in cls._SETS else v)
+        return s
+
+class MemorySessionStore:
+    """LRU + TTL en memoria del proceso."""
+
+    def __init__(self, max_items: int, ttl_s: float):
+        self.max_items, self.ttl_s = max_items, ttl_s
+        self._data: "OrderedDict[str, Tuple[float, SessionState]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        with self._lock:
+            entry = self._data.get(session_id)
+            if entry is None or entry[0] < time.time():
+                self._data.pop(session_id, None)
+                return None
+            self._data[session_id] = (time.time() + self.ttl_s, entry[1])
+            self._data.move_to_end(session_id)
+            return entry[1]
+
+    def put(self, session_id: str, state: SessionState):
+        with self._lock:
+            self._data[session_id] = (time.time() + self.ttl_s, state)
+            self._data.move_to_end(session_id)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._data.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class SqliteSessionStore:
+    """Misma semántica sobre SQLite (WAL), compartida por los workers de la máquina."""
+
+    def __init__(self, path: Path, max_items: int, ttl_s: float):
+        self.path, self.max_items, self.ttl_s = path, max_items, ttl_s
+        self._local = threading.local()
+        self._puts = 0
+        with self._conn() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY, state TEXT NOT NULL, expires REAL NOT NULL)""")
+            db.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions(expires)")
+
+    def _conn(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        db, now = self._conn(), time.time()
+        row = db.execute("SELECT state FROM sessions WHERE id=? AND expires>?", (session_id, now)).fetchone()
+        if row is None:
+            return None
+        db.execute("UPDATE sessions SET expires=? WHERE id=?", (now + self.ttl_s, session_id))
+        return SessionState.from_json(row[0])
+
+    def put(self, session_id: str, state: SessionState):
+        db, now = self._conn(), time.time()
+        db.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", (session_id, state.to_json(), now + self.ttl_s))
+        self._puts += 1
+        if self._puts % 100 == 0:  # purga ocasional: vencidas y, sobre el tope, las de uso más antiguo
+            db.execute("DELETE FROM sessions WHERE expires<?", (now,))
+            extra = db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_items
+            if extra > 0:
+                db.execute("DELETE FROM sessions WHERE id IN (SELECT id FROM sessions ORDER BY expires LIMIT ?)", (extra,))
+
+    def delete(self, session_id: str):
+        self._conn().execute("DELETE FROM sessions WHERE id=?", (session_id,))
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM sessions WHERE expires>?", (time.time(),)).fetchone()[0]
+
+_STORE = None
+
+def get_store():
+    global _STORE
+    if _STORE is None:
+        if SESSION_STORE == "sqlite":
+            _STORE = SqliteSessionStore(SESSION_STORE_PATH, SESSION_MAX, SESSION_TTL_S)
+        else:
+            _STORE = MemorySessionStore(SESSION_MAX, SESSION_TTL_S)
+    return _STORE
+
+def get_state(session_id: str) -> SessionState:
+    store = get_store()
+    s = store.get(session_id)
+    if s is None:
+        s = SessionState()
+        store.put(session_id, s)
+    return s
+
+def save_state(session_id: str, state: SessionState):
+    get_store().put(session_id, state)
 
 _MORE = {
     "muestrame otros","muestrame mas","mostrar mas","mostrar más","otros","más","mas",
@@ -63,3 +216,4 @@ def classify_intent(text: str) -> Intent:
 def update_state(session_id: str, delta: dict):
     s = get_state(session_id)
     s.update(delta)
+    save_state(session_id, s)
@@ -0,0 +1,110 @@
+# backend/services/suggest_index.py
+"""Sugerencias por prefijo para el autocompletado del chat.
+
+Se arma con cada snapshot: claves normalizadas (norm_txt) ordenadas, así un prefijo es un
+rango contiguo que se encuentra con bisect. Entran:
+  - nombres de producto, desde cada palabra ("colg" -> "Luminaria colgante 48W ...");
+  - códigos ("ving125" -> "VING125-C");
+  - categorías (peso por cantidad de productos);
+  - términos del vocabulario del índice (peso = IDF: los más específicos primero).
+
+A eso se suma la popularidad: cuántas veces se buscó ese término/consulta en este proceso
+(`record_query`, lo llama el chat). El recorrido de un rango tiene tope de entradas y de
+tiempo (SUGGEST_BUDGET_MS).
+"""
+from __future__ import annotations
+import math, os, time
+from bisect import bisect_left
+from collections import Counter
+from heapq import nlargest
+from typing import List, NamedTuple
+
+from backend.services.packed_index import PackedIndex
+from backend.services.text_analysis import norm_txt
+
+SUGGEST_BUDGET_MS = float(os.getenv("ECOLITE_SUGGEST_BUDGET_MS", "2"))
+SUGGEST_SCAN_MAX = int(os.getenv("ECOLITE_SUGGEST_SCAN_MAX", "5000"))
+SUGGEST_MIN_LEN = 2
+POPULAR_MAX = 5000
+
+# pesos base por tipo; la popularidad suma POP_WEIGHT * log(1 + búsquedas)
+W_PRODUCT, W_PRODUCT_START, W_CODE, W_CATEGORY = 1.0, 0.5, 2.0, 2.0
+POP_WEIGHT = 1.0
+NAME_WORDS = 6  # palabras del nombre desde las que también se sugiere
+
+class Suggestion(NamedTuple):
+    text: str         # lo que va al input
+    kind: str         # product | code | category | term
+    code: str | None  # producto asociado (product/code)
+    weight: float
+    pop_key: str      # clave con la que se cuenta su popularidad
+
+_POPULAR: Counter = Counter()
+
+def record_query(query: str):
+    """Cuenta una búsqueda (la consulta completa y cada palabra) para ordenar sugerencias."""
+    q = norm_txt(query)
+    if not q:
+        return
+    _POPULAR[q] += 1
+    for w in set(q.split()):
+        _POPULAR[w] += 1
+    if len(_POPULAR) > POPULAR_MAX:
+        keep = _POPULAR.most_common(POPULAR_MAX // 2)
+        _POPULAR.clear()
+        _POPULAR.update(dict(keep))
+
+class SuggestIndex:
+    def __init__(self, ix: PackedIndex):
+        pairs: List[tuple] = []
+        cats: Counter = Counter()
+        for row in range(ix.n):
+            if not ix.is_live(row):
+                continue
+            p = ix.record(row)
+            code, name = p.get("code") or "", p.get("name") or ""
+            words = (p.get("name_norm") or "").split()
+            for i in range(min(len(words), NAME_WORDS)):
+                key = " ".join(words[i:])
+                pairs.append((key, Suggestion(name, "product", code, W_PRODUCT + (W_PRODUCT_START if i == 0 else 0.0), key)))
+            if p.get("code_norm"):
+                pairs.append((p["code_norm"], Suggestion(code, "code", code, W_CODE, p["code_norm"])))
+            cats.update(set(p.get("categories_norm") or []))
+        for key, n in cats.items():
+            pairs.append((key, Suggestion(key.capitalize(), "category", None, W_CATEGORY + math.log1p(n), key)))
+        n_docs = max(1, ix.n_docs)
+        terms, df = ix.terms, ix.df
+        for tid in range(len(terms)):
+            t = terms[tid]
+            if len(t) >= 3 and t.isalpha() and df[tid] > 0:
+                pairs.append((t, Suggestion(t, "term", None, math.log(1 + n_docs / df[tid]), t)))
+        pairs.sort(key=lambda kv: kv[0])
+        self.keys = [k for k, _ in pairs]
+        self.entries = [e for _, e in pairs]
+
+    def suggest(self, query: str, limit: int = 8) -> List[Suggestion]:
+        q = norm_txt(query)
+        if len(q) < SUGGEST_MIN_LEN or limit <= 0:
+            return []
+        keys, entries = self.keys, self.entries
+        lo = bisect_left(keys, q)
+        hi = min(bisect_left(keys, q + "\uffff", lo), lo + SUGGEST_SCAN_MAX)
+        deadline = time.perf_counter() + SUGGEST_BUDGET_MS / 1000
+
+        def scored():
+            for i in range(lo, hi):
+                if not (i - lo) & 255 and time.perf_counter() > deadline:
+                    return
+                e = entries[i]
+                yield e.weight + POP_WEIGHT * math.log1p(_POPULAR.get(e.pop_key, 0)) + (1.0 if keys[i] == q else 0.0), i
+
+        out: List[Suggestion] = []
+        seen = set()
+        for _, i in nlargest(limit * 3, scored()):
+            e = entries[i]
+            if (e.text, e.kind) not in seen:
+                seen.add((e.text, e.kind))
+                out.append(e)
+                if len(out) >= limit:
+                    break
+        return out
@@ -0,0 +1,82 @@
+# backend/services/text_analysis.py
+"""Normalización y tokenización de texto: una sola implementación para la carga del
+catálogo, la construcción del índice y las consultas.
+
+- `norm_txt`: minúsculas, sin tildes, espacios y "_" colapsados (campos *_norm del catálogo).
+- `norm_query`: además cambia los signos (menos "-") por espacios (texto de la consulta).
+- `tokens`: corridas de letras o de dígitos de 2+ caracteres ("IP65" -> ip, 65).
+  `split_norm` hace lo mismo sobre texto que ya pasó por `norm_txt`, sin renormalizar.
+- `query_tokens`: `tokens(norm_query(q))` memoizado (LRU, ECOLITE_TEXT_CACHE_MAX).
+
+Las tildes se quitan con una tabla de `str.translate` precalculada para U+0080–U+1FFF
+(latín, griego, cirílico...); solo el texto con caracteres fuera de ese rango pasa por
+`unicodedata` carácter a carácter. Los términos del catálogo se internan (`intern_term`):
+los tokens repetidos entre productos son el mismo objeto.
+"""
+from __future__ import annotations
+import os, re, sys, unicodedata
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+TEXT_CACHE_MAX = int(os.getenv("ECOLITE_TEXT_CACHE_MAX", "4096"))
+
+_TABLE_END = 0x2000
+
+def _slow_strip(s: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFD", s) if unicodedata.category(c) != "Mn")
+
+def _fold_table() -> Dict[int, str]:
+    table = {}
+    for cp in range(0x80, _TABLE_END):
+        c = chr(cp)
+        out = _slow_strip(c)
+        if out != c:
+            table[cp] = out
+    return table
+
+_FOLD = _fold_table()
+
+def strip_accents(s: str) -> str:
+    if s.isascii():
+        return s
+    if max(s) < chr(_TABLE_END):
+        return s.translate(_FOLD)
+    return _slow_strip(s)
+
+_SPACES = re.compile(r"[\s_]+")
+_PUNCT = re.compile(r"[^\w\s\-]+")
+# equivale a separar número/letra ("3000k" -> 3000 k) y cortar en todo lo que no sea a-z0-9
+_RUNS = re.compile(r"[a-z]+|[0-9]+")
+
+def norm_txt(s: str) -> str:
+    return _SPACES.sub(" ", strip_accents((s or "").lower())).strip()
+
+def norm_query(s: str) -> str:
+    return _SPACES.sub(" ", _PUNCT.sub(" ", strip_accents((s or "").lower()))).strip()
+
+def split_norm(s: str) -> List[str]:
+    """Tokens de un texto ya normalizado con `norm_txt` / `norm_query`."""
+    return [t for t in _RUNS.findall(s) if len(t) >= 2]
+
+def tokens(s: str) -> List[str]:
+    return split_norm(norm_txt(s))
+
+_TERMS: Dict[str, str] = {}
+
+def intern_term(t: str) -> str:
+    """Misma instancia para el mismo término (el hash queda calculado una vez por término)."""
+    return _TERMS.setdefault(t, t)
+
+def index_tokens(s: str) -> List[str]:
+    """`split_norm` con términos internados (construcción del índice)."""
+    return [intern_term(t) for t in split_norm(s)]
+
+@lru_cache(maxsize=TEXT_CACHE_MAX)
+def query_tokens(q: str) -> Tuple[str, ...]:
+    # solo consulta la tabla: las palabras de las consultas (typos incluidos) no la hacen crecer
+    return tuple(_TERMS.get(t, t) for t in split_norm(norm_query(q)))
+
+def cache_stats() -> Dict[str, int]:
+    info = query_tokens.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max": info.maxsize,
+            "terms": len(_TERMS)}
@@ -0,0 +1,64 @@
+# bench/__main__.py
+"""Benchmarks del pipeline de chat.
+
+    python -m bench micro                     # microbenchmarks con el catálogo real
+    python -m bench micro --catalog-size 20000  # ... con un catálogo sintético de 20k SKUs
+    python -m bench load --requests 500 --concurrency 50
+    python -m bench all --save-baseline       # actualiza bench/baseline.json
+
+Reporta p50/p95/p99 y throughput por escenario, y compara el p50 con bench/baseline.json
+(regresión si es >25% más lento, --tolerance). La línea base depende de la máquina:
+guardarla y compararla en la misma; en máquinas compartidas subir la tolerancia.
+Siempre trabaja sobre una copia temporal del catálogo.
+"""
+from __future__ import annotations
+import argparse, os, shutil, sys, tempfile
+from pathlib import Path
+
+from bench import report
+from bench.synth_catalog import SRC, write_catalog
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmarks del pipeline de chat")
+    ap.add_argument("suite", choices=("micro", "load", "all"))
+    ap.add_argument("--catalog-size", type=int, default=0, help="SKUs del catálogo sintético (0 = el real)")
+    ap.add_argument("--reps", type=int, default=10)
+    ap.add_argument("--requests", type=int, default=300)
+    ap.add_argument("--concurrency", type=int, default=20)
+    ap.add_argument("--llm-latency-ms", type=float, default=200)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=report.TOLERANCE,
+                    help="p50 más lento que la base por encima de esto = regresión (0.25 = 25%%)")
+    a = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="ecolite-bench-"))
+    try:
+        catalog = tmp / "productos.json"
+        if a.catalog_size:
+            write_catalog(a.catalog_size, catalog)
+        else:
+            shutil.copy(SRC, catalog)
+            if (SRC.parent / "datasheets.json").exists():
+                shutil.copy(SRC.parent / "datasheets.json", tmp / "datasheets.json")
+        # antes de importar backend: el loader lee la ruta al importarse
+        os.environ["ECOLITE_PRODUCTS_PATH"] = str(catalog)
+        os.environ["ECOLITE_RANKED_CACHE_MAX"] = "0"
+
+        results = {}
+        if a.suite in ("micro", "all"):
+            from bench import micro
+            results.update(micro.run(a.reps))
+        if a.suite in ("load", "all"):
+            from bench import load
+            results.update(load.run(a.requests, a.concurrency, a.llm_latency_ms))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    regressions = report.print_table(results, report.load_baseline(), a.tolerance)
+    if a.save_baseline:
+        report.save_baseline(results)
+        print(f"línea base guardada en {report.BASELINE_PATH}")
+    return 1 if regressions and not a.save_baseline else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
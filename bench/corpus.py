@@ -0,0 +1,40 @@
+# bench/corpus.py
+"""Consultas de referencia para benchmarks, por tipo (el reporte separa latencias por tipo)."""
+
+QUERIES = {
+    "natural": [
+        "necesito una lampara para la sala",
+        "luminaria colgante para comedor",
+        "que me recomiendas para iluminar un parqueadero",
+        "bombillo para la mesa de noche",
+        "luz para exteriores que aguante lluvia",
+        "aplique de pared para el patio",
+        "lampara de escritorio",
+        "iluminacion para una oficina",
+        "tira led para debajo de los gabinetes de la cocina",
+        "reflector para una cancha",
+    ],
+    "codes": [
+        "LEDLC3B", "VING125-C", "ledlc3", "DLGUALCTB", "NICHA", "TLCT TLCX", "FLOSUN200-F", "vinfa-c",
+    ],
+    "typos": [
+        "reflestor", "lampra colgnte", "pannel solr", "bombiyo", "luminaira", "intrruptor doble",
+        "refletcor 50w", "dicroika gu10",
+    ],
+    "plurals": [
+        "paneles led", "luces de navidad", "reflectores solares", "bombillos e27", "apliques exteriores",
+        "lamparas colgantes",
+    ],
+    "specs": [
+        "reflector 200W IP65", "panel 12w 4000k", "cinta 12v ip65", "tubo t8 18w", "campana industrial 150w",
+        "reflector 200W IP65 6500K under $300.000", "bombillo 12w menos de 10 mil", "panel entre 20.000 y 40.000",
+        "3000k", "fuente 12v",
+    ],
+    "offtopic": [
+        "hola", "cual es la garantia", "hacen envios a medellin", "telefono de contacto", "xyzqwv",
+        "quienes son ustedes", "gracias",
+    ],
+}
+
+def all_queries():
+    return [(kind, q) for kind, qs in QUERIES.items() for q in qs]
@@ -0,0 +1,81 @@
+# bench/load.py
+"""Prueba de carga de punta a punta de /chat/ contra el stub local del LLM.
+
+Levanta el stub (backend.services.openai_stub) y la app con uvicorn en puertos libres,
+con el catálogo temporal de bench/__main__ y la caché de respuestas apagada (cada request
+paga búsqueda + LLM), y dispara `requests` pedidos con `concurrency` en vuelo.
+"""
+from __future__ import annotations
+import asyncio, os, random, socket, subprocess, sys, time
+from pathlib import Path
+from typing import Dict, List
+
+from bench.corpus import all_queries
+from bench.report import summarize
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _spawn(app: str, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+async def _wait_ready(client, url: str, timeout_s: float = 60):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} no respondió en {timeout_s:.0f}s")
+
+async def _drive(base: str, requests: int, concurrency: int, seed: int) -> Dict[str, Dict[str, float]]:
+    import httpx
+    queries = all_queries()
+    rng = random.Random(seed)
+    plan = [rng.choice(queries) for _ in range(requests)]
+    lat: List[float] = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=base, timeout=60,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        await _wait_ready(client, "/healthz")
+        await client.post("/chat/", json={"session_id": "warm", "message": "panel led"})
+
+        async def one(i: int, q: str):
+            nonlocal errors
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post("/chat/", json={"session_id": f"s{i}", "message": q})
+                lat.append(time.perf_counter() - t0)
+                errors += r.status_code != 200
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i, q) for i, (_, q) in enumerate(plan)))
+        wall = time.perf_counter() - t0
+    out = summarize(lat, wall)
+    out["errors"] = errors
+    return {f"load/c={concurrency}/chat": out}
+
+def run(requests: int = 300, concurrency: int = 20, llm_latency_ms: float = 200, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    stub_port, app_port = _free_port(), _free_port()
+    stub = _spawn("backend.services.openai_stub:app", stub_port, {"OPENAI_STUB_LATENCY_MS": str(llm_latency_ms)})
+    app = _spawn("main:app", app_port, {
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+        "OPENAI_API_KEY": "stub",
+        "ECOLITE_REPLY_CACHE": "off",
+    })
+    try:
+        return asyncio.run(_drive(f"http://127.0.0.1:{app_port}", requests, concurrency, seed))
+    finally:
+        for p in (app, stub):
+            p.terminate()
+            p.wait(timeout=10)
@@ -0,0 +1,67 @@
+# bench/micro.py
+"""Microbenchmarks del camino de búsqueda y de la carga del catálogo.
+
+Se importa después de que bench/__main__ fijó ECOLITE_PRODUCTS_PATH a una copia temporal
+(el build escribe el snapshot junto al catálogo) y apagó la caché de rankings (se mide el
+ranking, no el recorte de una lista ya guardada).
+"""
+from __future__ import annotations
+import time
+from typing import Callable, Dict, List
+
+from bench.corpus import QUERIES, all_queries
+from bench.report import summarize
+
+def _timeit(fn: Callable[[], object], reps: int) -> List[float]:
+    out = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+def _each(items, fn, reps: int) -> List[float]:
+    for it in items:  # calentamiento: cachés de CPU, memos de términos, páginas del mmap
+        fn(it)
+    samples: List[float] = []
+    for it in items:
+        samples.extend(_timeit(lambda: fn(it), reps))
+    return samples
+
+def run(reps: int = 5) -> Dict[str, Dict[str, float]]:
+    from backend.services import product_loader as pl
+    from backend.services import search_service as s
+    from backend.services.text_analysis import query_tokens
+
+    res: Dict[str, Dict[str, float]] = {}
+    n = len(pl.read_catalog(pl._resolve_path()))
+    tag = f"micro/n={n}"
+
+    # construcción: carga sin snapshot, normalización por registro, índice + snapshot
+    raw = pl.read_catalog(pl._resolve_path())
+    res[f"{tag}/catalog.load"] = summarize(_timeit(lambda: pl._load_from_disk(use_snapshot=False), max(1, reps // 5)))
+    recs = list(raw.values())[:2000]
+    res[f"{tag}/_postprocess_record"] = summarize(_each(recs, lambda r: pl._postprocess_record(dict(r)), 1))
+    productos = pl._load_from_disk(use_snapshot=False)
+    path = pl._resolve_path()
+    res[f"{tag}/_build_snapshot"] = summarize(_timeit(lambda: s._build_snapshot(productos, path, None), max(1, reps // 5)))
+
+    snap = s.current_index()
+    ix = snap.packed
+    qs = [q for _, q in all_queries()]
+    toks = {q: list(query_tokens(q)) for q in qs}
+    expands = {q: s._expand_query_tokens(ix, toks[q]) for q in qs}
+    codes = [ix.codes[row] for row in range(0, ix.n, max(1, ix.n // 25))]
+
+    # sin la memoización: el costo de normalizar una consulta nueva
+    res[f"{tag}/_tok"] = summarize(_each(qs, lambda q: query_tokens.__wrapped__(q), reps * 20))
+    res[f"{tag}/_expand_query_tokens"] = summarize(_each(qs, lambda q: s._expand_query_tokens(ix, toks[q]), reps))
+    res[f"{tag}/_score_product"] = summarize(
+        _each([(q, c) for q in qs[:20] for c in codes], lambda qc: s._score_product(ix, qc[1], toks[qc[0]], expands[qc[0]]), 1))
+    # lo que quedó del fallback de recall: corrección de typos y consultas sin resultados
+    typo_words = [w for q in QUERIES["typos"] for w in query_tokens(q)]
+    res[f"{tag}/spell.correct"] = summarize(_each(typo_words, snap.spell.correct, reps))
+    res[f"{tag}/search_page[zero-hit]"] = summarize(_each(["xyzqwv", "qwrtzp kkkk"], lambda q: s.search_page(q, {}), reps))
+    for kind, kqs in QUERIES.items():
+        res[f"{tag}/search_page[{kind}]"] = summarize(_each(kqs, lambda q: s.search_page(q, {"result_seed": 7}), reps))
+    return res
@@ -0,0 +1,67 @@
+# bench/prompt_tokens.py
+"""Tokens por request: prompt compacto (context_builder) contra el formato anterior (v1).
+
+    python -m bench.prompt_tokens [--limit 5]
+
+Arma ambos prompts con los candidatos reales de cada consulta del corpus (página 0) y
+reporta el promedio de tokens y el ahorro. Usa la misma estimación que el presupuesto
+(`estimate_tokens`: tiktoken si está instalado, si no la aproximación local).
+"""
+from __future__ import annotations
+import argparse, json, sys
+
+from bench.corpus import all_queries
+
+# formato v1 (json con indent=2 y las reglas dentro del mismo mensaje), solo como referencia
+_V1_RULES = """
+Eres el asistente de Ecolite (Colombia). Sé claro, breve y profesional con tono cercano.
+Usa emojis con moderación (💡👌✨). Ayuda a elegir el producto correcto.
+
+REGLAS:
+- SOLO puedes recomendar productos de la sección CANDIDATOS_PROD que te pasa el sistema.
+- No inventes productos.
+- Si faltan datos (espacio, instalación, vatios, temperatura, presupuesto), haz 1 pregunta concreta.
+"""
+
+def _v1(state: dict, candidates: list) -> str:
+    snap = {"ultima_consulta": state.get("last_user_msg"), "preferencias": state.get("preferencias"),
+            "page": state.get("page")}
+    return f"""
+{_V1_RULES}
+
+ESTADO:
+{json.dumps(snap, ensure_ascii=False, indent=2)}
+
+CANDIDATOS_PROD (elige SOLO de esta lista):
+{json.dumps(candidates, ensure_ascii=False, indent=2)}
+
+Redacta una respuesta corta (1–2 frases). Si no hay productos, pide un dato faltante.
+"""
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--limit", type=int, default=5, help="candidatos por consulta (como /chat/)")
+    a = ap.parse_args()
+
+    from backend.services.context_builder import PROMPT_TOKEN_BUDGET, build_prompt, estimate_tokens
+    from backend.services.search_service import search_candidates
+
+    rows = []
+    for kind, q in all_queries():
+        state = {"last_user_msg": q, "page": 0, "preferencias": None, "result_seed": 7}
+        cand = search_candidates(q, state, limit=a.limit)
+        old = estimate_tokens(_v1(state, cand))
+        p = build_prompt(state, cand)
+        rows.append((kind, q, len(cand), old, p.tokens, len(p.ids) < len(cand)))
+
+    print(f"{'tipo':<9} {'consulta':<42} {'cand':>4} {'v1':>6} {'nuevo':>6}")
+    for kind, q, n, old, new, cut in rows:
+        print(f"{kind:<9} {q[:42]:<42} {n:>4} {old:>6} {new:>6}{'  (recortado)' if cut else ''}")
+    old_avg = sum(r[3] for r in rows) / len(rows)
+    new_avg = sum(r[4] for r in rows) / len(rows)
+    print(f"\npromedio por request: v1 {old_avg:.0f} tokens, nuevo {new_avg:.0f} tokens "
+          f"(ahorro {old_avg - new_avg:.0f}, {100 * (1 - new_avg / old_avg):.0f}%); presupuesto {PROMPT_TOKEN_BUDGET}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+# bench/report.py
+"""Percentiles, tabla de resultados y comparación contra la línea base guardada."""
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import Dict, List
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+# p50 más lento que la línea base por encima de esto se marca como regresión
+# (la mediana es estable entre corridas; p95/p99 en una máquina compartida no tanto)
+TOLERANCE = 0.25
+
+def percentile(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = (len(sorted_vals) - 1) * p
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+def summarize(samples_s: List[float], wall_s: float | None = None) -> Dict[str, float]:
+    """Latencias (s) -> p50/p95/p99 en ms y throughput (ops/s; con `wall_s` si hubo concurrencia)."""
+    v = sorted(samples_s)
+    total = wall_s if wall_s is not None else sum(v)
+    return {
+        "n": len(v),
+        "p50_ms": percentile(v, 0.50) * 1e3,
+        "p95_ms": percentile(v, 0.95) * 1e3,
+        "p99_ms": percentile(v, 0.99) * 1e3,
+        "ops_s": len(v) / total if total > 0 else 0.0,
+    }
+
+def load_baseline(path: Path = BASELINE_PATH) -> Dict[str, Dict[str, float]]:
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_baseline(results: Dict[str, Dict[str, float]], path: Path = BASELINE_PATH):
+    merged = {**load_baseline(path), **results}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(merged.items())), f, indent=2)
+        f.write("\n")
+
+def print_table(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                tolerance: float = TOLERANCE) -> int:
+    """Imprime resultados (y Δp50 vs línea base). Devuelve cuántas regresiones hubo."""
+    regressions = 0
+    print(f"{'escenario':<44}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>11}  vs base p50")
+    for name, r in results.items():
+        note = ""
+        base = baseline.get(name)
+        if base and base.get("p50_ms"):
+            delta = r["p50_ms"] / base["p50_ms"] - 1
+            note = f"{delta:+.0%}"
+            if delta > tolerance:
+                note += "  REGRESIÓN"
+                regressions += 1
+        if r.get("errors"):
+            note += f"  errores={r['errors']:g}"
+        print(f"{name:<44}{r['n']:>7}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['ops_s']:>11.1f}  {note}")
+    return regressions
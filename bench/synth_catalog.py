@@ -0,0 +1,55 @@
+# bench/synth_catalog.py
+"""Catálogo sintético: escala productos.json a N SKUs (10k-100k) para medir con catálogos grandes.
+
+    python -m bench.synth_catalog --n 20000 --out /tmp/cat20k/productos.json
+
+Cada copia cambia código, vatios y precio del original, así el vocabulario y los códigos
+crecen como en un catálogo real (no son duplicados exactos).
+"""
+from __future__ import annotations
+import argparse, json, random, re
+from pathlib import Path
+from typing import Dict
+
+SRC = Path(__file__).resolve().parent.parent / "backend" / "data" / "productos.json"
+_WATTS = re.compile(r"\b(\d{1,3})\s?W\b", re.I)
+_WATT_STEPS = (3, 5, 7, 9, 12, 15, 18, 20, 24, 30, 36, 40, 48, 50, 60, 80, 100, 120, 150, 200, 300)
+
+def synthesize(src: Dict[str, dict], n: int, seed: int = 0) -> Dict[str, dict]:
+    rng = random.Random(seed)
+    base = list(src.items())
+    out: Dict[str, dict] = {}
+    for i in range(n):
+        code, rec = base[i % len(base)]
+        if i < len(base):
+            out[code] = rec
+            continue
+        rec = dict(rec)
+        new = f"{code}-S{i // len(base)}"
+        watts = rng.choice(_WATT_STEPS)
+        rec["code"] = new
+        rec["name"] = _WATTS.sub(f"{watts}W", str(rec.get("name") or "")).replace(code, new)
+        rec["price"] = f"${rng.randrange(20, 2000) * 1000:,}".replace(",", ".")
+        tags = rec.get("tags")
+        if isinstance(tags, str):
+            rec["tags"] = tags.replace(code, new)
+        elif isinstance(tags, list):
+            rec["tags"] = [new if t == code else t for t in tags]
+        out[new] = rec
+    return out
+
+def write_catalog(n: int, out: Path, seed: int = 0, src: Path = SRC) -> Path:
+    with open(src, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(synthesize(data, n, seed), f, ensure_ascii=False)
+    return out
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--n", type=int, default=10000)
+    ap.add_argument("--out", type=Path, required=True)
+    ap.add_argument("--seed", type=int, default=0)
+    a = ap.parse_args()
+    print(write_catalog(a.n, a.out, a.seed))
@@ -7,9 +7,10 @@ const stream = $('#cbStream'), input = $('#cbInput'), sendBtn = $('#cbSend');
 let sessionId = localStorage.getItem("ecolite_session") || (crypto?.randomUUID?.() || String(Date.now()));
 localStorage.setItem("ecolite_session", sessionId);
 
-// Paginación 100% en cliente (server stateless)
+// Paginación en cliente (server stateless): el server devuelve un cursor opaco para "ver más"
 let lastQuery = "";
 let page = 0;
+let cursor;  // undefined: el server no indicó si hay más
 const PAGE_SIZE = 5;
 
 function openPanel() {
@@ -47,11 +48,18 @@ function renderProducts(items) {
         <div class="prod-name">${escapeHtml(p.name || '')}</div>
         <div class="prod-price">${escapeHtml(p.price || '')}</div>
         <a class="prod-link" href="${escapeAttr(p.url || '#')}" target="_blank" rel="noopener">Ver producto</a>
+        ${p.code ? `<button class="prod-link prod-similar" data-code="${escapeAttr(p.code)}">Parecidos</button>` : ''}
       </div>
     `).join('')}
   </div>`;
 }
 
+// "Parecidos" en una tarjeta: el chat responde con los vecinos precalculados del producto
+stream.addEventListener('click', e => {
+  const btn = e.target.closest('.prod-similar');
+  if (btn) sendMessage(`parecidos a ${btn.dataset.code}`);
+});
+
 function parseInlineProducts(text) {
   const lines = (text || "").split('\n').map(l => l.trim()).filter(Boolean);
   const out = [];
@@ -64,7 +72,8 @@ function parseInlineProducts(text) {
 
 function maybeToggleShowMore(products) {
   let btn = $('#cbShowMore');
-  if (Array.isArray(products) && products.length === PAGE_SIZE) {
+  const more = cursor !== undefined ? !!cursor : (Array.isArray(products) && products.length === PAGE_SIZE);
+  if (more) {
     if (!btn) {
       btn = el('button', 'show-more');
       btn.id = 'cbShowMore';
@@ -105,41 +114,135 @@ async function sendMessage(raw, isShowMore = false) {
   } else {
     page = 0;
     lastQuery = msg;
+    cursor = undefined;
   }
 
   if (!isShowMore) pushMe(msg);
   input.value = "";
   typing(true);
 
+  const body = JSON.stringify({ session_id: sessionId, message: effectiveQuery, last_query: lastQuery, page,
+                                cursor: page > 0 ? cursor || null : null });
   try {
-    const res = await fetch("/chat/", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ session_id: sessionId, message: effectiveQuery, last_query: lastQuery, page })
-    });
-
-    const raw = await res.text();
-    let data = null; try { data = raw ? JSON.parse(raw) : null; } catch {}
+    // SSE: las tarjetas llegan de inmediato y el texto del asistente se va escribiendo
+    const res = await fetch("/chat/stream", { method: "POST", headers: { "Content-Type": "application/json" }, body });
+    if (!res.ok) return showServerError(res, "/chat/stream");
+    if (!res.body || !window.TextDecoder) return renderClassic(await fetch("/chat/", { method: "POST", headers: { "Content-Type": "application/json" }, body }));
 
-    if (!res.ok) {
+    const bot = pushBotStreaming();
+    await readSSE(res, (event, data) => {
       typing(false);
-      const detail = (data && (data.detail || data.error || data.message)) || raw || "";
-      console.error("Error /chat/:", res.status, detail);
-      pushBot(`⚠️ Error del servidor (${res.status}). ${detail ? "Detalle: " + escapeHtml(String(detail)).slice(0, 240) : "Intenta de nuevo."}`);
-      return;
-    }
-
+      if (event === 'products') { cursor = data.cursor; bot.products(Array.isArray(data.products) ? data.products : []); }
+      else if (event === 'delta') bot.append(data.text || '');
+      else if (event === 'done') bot.done(data.content || '');
+    });
     typing(false);
-    const text = (data && (data.content || data.reply)) || "Aquí tienes algunas opciones recomendadas:";
-    const products = Array.isArray(data?.products) ? data.products : [];
-    pushBot(text, products);
-
   } catch (e) {
     typing(false);
-    console.error("Network error /chat/:", e);
+    console.error("Network error /chat/stream:", e);
     pushBot("⚠️ No me pude conectar, intenta de nuevo.");
   }
 }
 
+async function showServerError(res, path) {
+  typing(false);
+  const raw = await res.text();
+  let data = null; try { data = raw ? JSON.parse(raw) : null; } catch {}
+  const detail = (data && (data.detail || data.error || data.message)) || raw || "";
+  console.error(`Error ${path}:`, res.status, detail);
+  pushBot(`⚠️ Error del servidor (${res.status}). ${detail ? "Detalle: " + escapeHtml(String(detail)).slice(0, 240) : "Intenta de nuevo."}`);
+}
+
+// Respuesta completa de /chat/ (navegadores sin streams en fetch)
+async function renderClassic(res) {
+  if (!res.ok) return showServerError(res, "/chat/");
+  const raw = await res.text();
+  let data = null; try { data = raw ? JSON.parse(raw) : null; } catch {}
+  typing(false);
+  const text = (data && (data.content || data.reply)) || "Aquí tienes algunas opciones recomendadas:";
+  const products = Array.isArray(data?.products) ? data.products : [];
+  cursor = data?.cursor;
+  pushBot(text, products);
+}
+
+// Burbuja del bot que se completa por partes: productos primero, texto a medida que llega
+function pushBotStreaming() {
+  const row = el('div', 'msg');
+  const bubble = el('div', 'bubble');
+  const textEl = el('div', 'bot-text');
+  const prodEl = el('div');
+  bubble.appendChild(textEl);
+  bubble.appendChild(prodEl);
+  row.appendChild(bubble);
+  stream.appendChild(row);
+  let text = '', items = [];
+  const scroll = () => stream.scrollTo({ top: stream.scrollHeight, behavior: 'smooth' });
+  return {
+    products(list) {
+      items = list;
+      prodEl.innerHTML = items.length ? renderProducts(items) : '';
+      maybeToggleShowMore(items);
+      scroll();
+    },
+    append(t) {
+      text += t;
+      textEl.innerHTML = linkify(escapeHtml(text));
+      scroll();
+    },
+    done(full) {
+      text = full || text || "Aquí tienes algunas opciones recomendadas:";
+      textEl.innerHTML = linkify(escapeHtml(text));
+      if (!items.length) this.products(parseInlineProducts(text));
+    },
+  };
+}
+
+// Lee un cuerpo text/event-stream y llama onEvent(evento, datos JSON) por cada bloque
+async function readSSE(res, onEvent) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buf += decoder.decode(value, { stream: true });
+    let i;
+    while ((i = buf.indexOf('\n\n')) >= 0) {
+      const block = buf.slice(0, i);
+      buf = buf.slice(i + 2);
+      let event = 'message', data = '';
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
+}
+
+// Autocompletado: /search/suggest con debounce; GET simple para que el navegador lo cachee
+const suggestList = $('#cbSuggest');
+const SUGGEST_DEBOUNCE_MS = 150;
+let suggestTimer = null, suggestSeq = 0;
+
+function fetchSuggestions(q) {
+  const seq = ++suggestSeq;
+  fetch(`/search/suggest?q=${encodeURIComponent(q)}&limit=8`)
+    .then(res => res.ok ? res.json() : null)
+    .then(data => {
+      if (!data || seq !== suggestSeq) return;  // llegó una respuesta vieja
+      suggestList.innerHTML = (data.suggestions || [])
+        .map(s => `<option value="${escapeAttr(s.text)}">${s.kind === 'code' ? 'Código' : ''}</option>`).join('');
+    })
+    .catch(() => {});
+}
+
+input.addEventListener('input', () => {
+  clearTimeout(suggestTimer);
+  const q = input.value.trim();
+  if (q.length < 2) { suggestList.innerHTML = ''; return; }
+  suggestTimer = setTimeout(() => fetchSuggestions(q), SUGGEST_DEBOUNCE_MS);
+});
+
 sendBtn.addEventListener('click', () => sendMessage());
 input.addEventListener('keydown', e => { if (e.key === 'Enter') sendMessage(); });
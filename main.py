@@ -2,12 +2,19 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
-import logging
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+import importlib.util, logging, time
 
 from backend.routers import chat
 from backend.routers import admin
+from backend.routers import faq
+from backend.routers import search
+from backend.routers import products
 from backend.services.product_loader import load_products
+from backend.services.search_service import current_index, warm_index
+from backend.services import context_builder, openai_client, metrics, text_analysis
+from backend.services.ranked_cache import RANKED
+from backend.services.reply_cache import get_cache
 
 logger = logging.getLogger("uvicorn.error")
 
@@ -23,6 +30,9 @@ app.add_middleware(
 
 app.include_router(chat.router)
 app.include_router(admin.router)
+app.include_router(faq.router)
+app.include_router(search.router)
+app.include_router(products.router)
 
 app.mount("/static", StaticFiles(directory="frontend"), name="static")
 
@@ -34,17 +44,86 @@ def root():
 def health():
     return {"ok": True}
 
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    if not metrics.METRICS_ENABLED:
+        return await call_next(request)
+    t0, status = time.perf_counter(), 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # plantilla de la ruta ("/admin/products/{code}"), no la URL: cardinalidad acotada
+        route = getattr(request.scope.get("route"), "path", "other")
+        metrics.REQUESTS.inc(route=route, status=str(status))
+        # en /chat/stream es el tiempo hasta que empieza la respuesta, no el del stream completo
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - t0, route=route)
+
+@metrics.register_collector
+def _app_metrics():
+    snap = current_index()
+    cache = get_cache()
+    text = text_analysis.cache_stats()
+    return [
+        ("ecolite_catalog_version", "gauge", "Versión del catálogo publicada.", [({}, snap.version)]),
+        ("ecolite_catalog_products", "gauge", "Productos vivos en el índice.", [({}, snap.packed.n_docs)]),
+        ("ecolite_index_rows", "gauge", "Filas del índice (incluye las dadas de baja sin compactar).", [({}, snap.packed.n)]),
+        ("ecolite_index_terms", "gauge", "Términos del vocabulario.", [({}, len(snap.packed.terms))]),
+        ("ecolite_catalog_pending_batches", "gauge", "Lotes del log de cambios sin compactar.", [({}, snap.pending)]),
+        ("ecolite_cache_hits_total", "counter", "Hits por caché.", [
+            ({"cache": "ranked"}, RANKED.hits), ({"cache": "faq"}, faq._STATS["hits"]), ({"cache": "query_text"}, text["hits"])]
+            + ([({"cache": "reply"}, cache.hits)] if cache is not None else [])),
+        ("ecolite_cache_lookups_total", "counter", "Consultas por caché (hit rate = hits / lookups).", [
+            ({"cache": "ranked"}, RANKED.hits + RANKED.misses), ({"cache": "faq"}, faq._STATS["checks"]),
+            ({"cache": "query_text"}, text["hits"] + text["misses"])]
+            + ([({"cache": "reply"}, cache.hits + cache.misses)] if cache is not None else [])),
+        ("ecolite_coalesced_total", "counter", "Llamadas resueltas esperando una idéntica en curso.", [
+            ({"flight": f.name}, f.coalesced) for f in (chat.SEARCH_FLIGHT, chat.LLM_FLIGHT)]),
+        ("ecolite_llm_in_flight", "gauge", "Llamadas al LLM en curso.", [({}, chat.LLM_GATE.active)]),
+        ("ecolite_llm_queue_depth", "gauge", "Llamadas al LLM esperando turno.", [({}, chat.LLM_GATE.waiting)]),
+        ("ecolite_llm_shed_total", "counter", "Respuestas sin LLM (texto fijo) por motivo.", [
+            ({"reason": r}, n) for r, n in chat.LLM_GATE.shed.items()]),
+    ]
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/catalog/stats")
 def catalog_stats():
-    prods, path = load_products()
-    return {"count": len(prods), "path": str(path)}
+    snap = current_index()
+    return {"count": len(snap.productos), "path": str(snap.path), "version": snap.version}
 
 @app.exception_handler(Exception)
 async def unhandled_error(request: Request, exc: Exception):
     logger.exception("Unhandled error on %s %s", request.method, request.url.path)
     return JSONResponse(status_code=500, content={"error": "internal_error", "detail": str(exc)})
 
+# dependencias opcionales (requirements.txt): sin ellas todo funciona, pero por el camino lento
+_OPTIONAL_DEPS = (
+    ("numpy", "los filtros de specs se calculan en Python puro"),
+    ("scipy", "ECOLITE_SEARCH_ENGINE=sparse cae al motor Python"),
+    ("scipy", "los productos parecidos se precalculan en Python puro (lento con catálogos grandes)"),
+)
+
+def _log_fallbacks():
+    for module, effect in _OPTIONAL_DEPS:
+        if importlib.util.find_spec(module) is None:
+            logger.warning("%s no está instalado: %s.", module, effect)
+    if context_builder.TOKENIZER != "tiktoken":
+        logger.warning("tiktoken no disponible: los tokens del prompt se estiman por palabras.")
+
 @app.on_event("startup")
 def on_startup():
+    _log_fallbacks()
+    t0 = time.perf_counter()
     prods, path = load_products()
     logger.info("Catálogo cargado: %d productos desde %s", len(prods), path)
+    # el primer usuario no debe pagar la construcción del índice
+    n = warm_index()
+    logger.info("Índice de búsqueda listo: %d productos en %.0f ms", n, (time.perf_counter() - t0) * 1000)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await openai_client.aclose()
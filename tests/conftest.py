@@ -0,0 +1,17 @@
+# tests/conftest.py
+"""Las pruebas trabajan sobre una copia temporal del catálogo (las escrituras de /admin
+no tocan backend/data). La ruta se fija antes de importar backend: el loader la lee al importarse."""
+import os, shutil, sys, tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+_TMP = Path(tempfile.mkdtemp(prefix="ecolite-tests-"))
+for name in ("productos.json", "datasheets.json"):
+    if (ROOT / "backend" / "data" / name).exists():
+        shutil.copy(ROOT / "backend" / "data" / name, _TMP / name)
+os.environ["ECOLITE_PRODUCTS_PATH"] = str(_TMP / "productos.json")
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_TMP, ignore_errors=True)
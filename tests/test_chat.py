@@ -0,0 +1,20 @@
+# tests/test_chat.py
+from backend.routers.chat import ChatIn, _cache_key, _state
+from backend.services.search_service import search_page
+
+def test_search_is_shared_per_session_and_llm_by_candidates():
+    a, _, q = _state(ChatIn(session_id="s1", message="panel led 60x60"))
+    a2, _, _ = _state(ChatIn(session_id="s1", message="panel led 60x60"))
+    b, _, _ = _state(ChatIn(session_id="s2", message="panel led 60x60"))
+    assert a["result_seed"] == a2["result_seed"] != b["result_seed"]  # clave de SEARCH_FLIGHT por sesión
+    # la clave del LLM / reply_cache no depende de la sesión, solo de los candidatos
+    ca = search_page("VING125-C", a, 5)[0]
+    cb = search_page("VING125-C", b, 5)[0]
+    assert ca == cb and _cache_key("VING125-C", 0, ca) == _cache_key("VING125-C", 0, cb)
+    assert search_page(q, a, 5)[0] == search_page(q, a2, 5)[0]
+
+def test_message_length_is_capped():
+    from fastapi.testclient import TestClient
+    import main
+    r = TestClient(main.app).post("/chat/", json={"session_id": "s1", "message": "panel " * 1000})
+    assert r.status_code == 422
@@ -0,0 +1,11 @@
+# tests/test_context_builder.py
+from backend.services.context_builder import PROMPT_TOKEN_BUDGET, build_prompt
+from backend.services.search_service import search_page
+
+def test_long_message_keeps_candidates_within_budget():
+    cand, _ = search_page("panel led", {"result_seed": 1}, 5)
+    for msg in ("panel led para oficina " * 500, "🙂" * 5000):
+        p = build_prompt({"last_user_msg": msg, "page": 0}, cand)
+        assert len(p.ids) == len(cand) == 5
+        assert p.tokens <= PROMPT_TOKEN_BUDGET
+        assert len(p.user.splitlines()[0]) < 300
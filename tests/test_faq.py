@@ -0,0 +1,27 @@
+# tests/test_faq.py
+import pytest
+
+from backend.routers import faq
+
+@pytest.mark.parametrize("msg", [
+    "panel led para empresa",
+    "reflector ecolite 200w",
+    "bombillo que dure mucho tiempo",
+    "luces para dias festivos",
+    "cambio de luminarias para bodega",
+    "lampara que llega a 3 metros",
+    "panel 60x60 envio a cali",
+])
+def test_product_queries_go_to_search(msg):
+    assert faq.try_answer(msg) is None
+
+@pytest.mark.parametrize("msg, key", [
+    ("¿Hacen envíos a Cali?", "politica_envios"),
+    ("cuál es la garantía", "garantia"),
+    ("quiénes son ustedes", "quienes_somos"),
+    ("cual es su telefono", "contacto"),
+    ("quiero devolver un producto", "cambio_producto"),
+])
+def test_faq_questions(msg, key):
+    assert faq.match(msg) == key
+    assert faq.try_answer(msg) == faq.FAQS[key]
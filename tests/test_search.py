@@ -0,0 +1,40 @@
+# tests/test_search.py
+import pytest
+
+from backend.services.search_service import search_page
+from backend.services.specs import parse_query_filters
+
+def _codes(q, limit=5, **state):
+    return [p["code"] for p in search_page(q, {"result_seed": 1, **state}, limit)[0]]
+
+def test_budget_is_relaxed_before_specs():
+    # ningún reflector 200W IP65 6500K cuesta menos de $300.000: se suelta el precio, no las specs
+    codes = _codes("reflector 200W IP65 6500K menos de $300.000")
+    assert codes[0] == "FLOSUN200-F"
+    assert not {"DRTC7-12V", "DRTC8-24V"} & set(codes)
+
+@pytest.mark.parametrize("q, cct", [("panel hasta 3000k", 3000.0), ("bombillo desde 4000 K", 4000.0)])
+def test_kelvin_is_not_a_price(q, cct):
+    filters, _ = parse_query_filters(q)
+    assert ("cct_min", "<=", cct) in filters
+    assert not [f for f in filters if f[0].startswith("price")]
+
+def test_k_suffix_price():
+    assert parse_query_filters("reflector hasta 300k")[0] == [("price_min", "<=", 300000.0)]
+
+def test_sku_prefix_pages_come_from_one_source(monkeypatch):
+    from backend.services import search_service, sku_index
+    from backend.services.search_service import current_index
+
+    monkeypatch.setattr(sku_index, "PREFIX_MAX_ROWS", 5)
+    monkeypatch.setattr(search_service, "RANKED_MAX_ROWS", 12)
+    snap = current_index()
+    snap = snap._replace(skus=sku_index.SkuIndex(snap.packed))
+    expected = sorted(c for c in snap.productos if sku_index.norm_code(c).startswith("DLGU"))
+    assert len(expected) > 12
+    seen, offset, more = [], 0, True
+    while more:
+        page, more = search_page("DLGU", {"result_seed": 17}, 5, offset, index=snap)
+        seen += [p["code"] for p in page]
+        offset += 5
+    assert seen == sorted(seen, key=sku_index.norm_code) and sorted(seen) == expected
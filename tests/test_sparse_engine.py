@@ -0,0 +1,38 @@
+# tests/test_sparse_engine.py
+"""Paridad del motor disperso con `_score_row`: mismos scores y mismo top-k en todo el catálogo."""
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from backend.services import search_service as ss
+from backend.services.sparse_engine import SparseEngine
+from backend.services.text_analysis import query_tokens
+
+QUERIES = [
+    "panel 60x60", "reflector 200W IP65", "bombillo e27", "luminaria colgante", "LEDLC3B",
+    "VING125-C", "reflestor", "tira led 24v", "lampara de escritorio", "paneles led",
+    "luces de navidad", "ventilador techo", "cinta 12v ip65", "aplique pared exterior",
+    "3000k", "dicroica gu10", "tubo t8 18w", "campana industrial 150w", "poste solar", "piscina",
+]
+
+@pytest.fixture(scope="module")
+def packed_engine():
+    packed = ss.current_index().packed
+    return packed, SparseEngine(packed)
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_sparse_matches_python_scorer(packed_engine, query):
+    packed, engine = packed_engine
+    q_toks = list(query_tokens(query))
+    q = ss._query_terms(q_toks, ss._expand_query_tokens(packed, q_toks))
+    if not q:
+        pytest.skip("sin términos de consulta")
+    qinfo = ss._query_info(packed, q)
+    py = np.array([ss._score_row(packed, row, qinfo) for row in range(packed.n)])
+    sp = engine.score(qinfo)
+    np.testing.assert_allclose(sp, py, rtol=0, atol=1e-9)
+
+    def top(scores):
+        return [packed.codes[i] for i in sorted(range(len(scores)), key=lambda i: (-scores[i], packed.codes[i]))[:10]]
+    assert top(sp) == top(py)